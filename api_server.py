@@ -0,0 +1,295 @@
+import argparse
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+
+import cube
+import data_store
+
+# 输出字段名
+COLUMNS = {
+    '品牌': 'brand',
+    '车型': 'model',
+    '日期': 'period',
+    '销量': 'sales',
+    '去年同期': 'last_year',
+    '同比增长率': 'yoy',
+    '上期': 'previous',
+    '环比增长率': 'mom',
+    '占比': 'share',
+}
+
+# 月度和周度数据对应的表和日期格式
+FREQUENCIES = {
+    'monthly': ('model_monthly', '%Y-%m'),
+    'weekly': ('model_weekly', '%Y-%m-%d'),
+}
+
+
+class QueryError(ValueError):
+    """查询参数有误，返回400"""
+
+
+class LRUCache:
+    """线程安全的LRU缓存，保存序列化后的响应体"""
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def info(self):
+        with self._lock:
+            return {'size': len(self._data), 'maxsize': self.maxsize, 'hits': self.hits, 'misses': self.misses}
+
+
+class SalesData:
+    """持有当前数据版本的聚合表，数据版本变化时重新读取
+
+    数据版本最多每 check_interval 秒检查一次，避免每个请求都计算文件摘要。
+    """
+
+    def __init__(self, check_interval=5.0):
+        self.check_interval = check_interval
+        self.version = None
+        self.tables = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def current(self):
+        """返回 (数据版本, 聚合表)"""
+        with self._lock:
+            now = time.monotonic()
+            if self.tables is None or now - self._checked_at >= self.check_interval:
+                self._checked_at = now
+                version = data_store.data_version()
+                if version != self.version:
+                    self.tables = cube.load_tables(version)
+                    self.version = version
+            return self.version, self.tables
+
+
+def _values(params, name):
+    """取出多值参数，同时支持 brand=a&brand=b 和 brand=a,b 两种写法"""
+    values = []
+    for value in params.get(name, []):
+        values.extend(v.strip() for v in value.split(',') if v.strip())
+    return values
+
+
+def _timestamp(params, name):
+    value = params.get(name, [None])[0]
+    if not value:
+        return None
+    try:
+        return pd.Timestamp(value)
+    except ValueError:
+        raise QueryError(f'{name} 不是有效的日期: {value}')
+
+
+def _filter(frame, params, date_column='日期'):
+    """按品牌、车型和起止日期筛选，品牌为索引"""
+    brands = _values(params, 'brand')
+    if brands:
+        frame = frame[frame.index.isin(brands)]
+    models = _values(params, 'model')
+    if models and '车型' in frame.columns:
+        frame = frame[frame['车型'].isin(models)]
+    start, end = _timestamp(params, 'start'), _timestamp(params, 'end')
+    if start is not None:
+        frame = frame[frame[date_column] >= start]
+    if end is not None:
+        frame = frame[frame[date_column] <= end]
+    return frame
+
+
+def _records(frame, date_format='%Y-%m'):
+    """转换为记录列表，日期格式化为字符串，缺失值为null"""
+    frame = frame.reset_index()
+    if '日期' in frame.columns:
+        frame['日期'] = frame['日期'].dt.strftime(date_format)
+    frame = frame.rename(columns=COLUMNS)
+    return json.loads(frame.to_json(orient='records', force_ascii=False, double_precision=4))
+
+
+def query_brands(tables, params):
+    """品牌列表及各品牌最近一个月的销量"""
+    monthly = tables['brand_monthly']
+    latest = monthly[monthly['日期'] == monthly['日期'].max()]
+    return {
+        'latest_period': monthly['日期'].max().strftime('%Y-%m') if len(monthly) else None,
+        'brands': _records(latest[['销量']].sort_index()),
+    }
+
+
+def query_brand_totals(tables, params):
+    """品牌月度总销量及同比、环比增长率"""
+    frame = _filter(tables['brand_monthly'], params)
+    return {'data': _records(frame[['日期', '销量', '同比增长率', '环比增长率']])}
+
+
+def query_models(tables, params):
+    """车型月度或周度销量序列"""
+    freq = params.get('freq', ['monthly'])[0]
+    if freq not in FREQUENCIES:
+        raise QueryError(f'freq 只能是 {", ".join(FREQUENCIES)}')
+    name, date_format = FREQUENCIES[freq]
+    frame = _filter(tables[name], params)
+    return {'freq': freq, 'data': _records(frame[['车型', '日期', '销量', '同比增长率', '环比增长率']], date_format)}
+
+
+def query_yoy(tables, params):
+    """某一月份（默认最近一个月）各品牌或各车型的销量、去年同期销量和同比增长率"""
+    level = params.get('level', ['brand'])[0]
+    if level not in ('brand', 'model'):
+        raise QueryError('level 只能是 brand 或 model')
+    frame = tables['brand_monthly' if level == 'brand' else 'model_monthly']
+    period = _timestamp(params, 'period')
+    period = period if period is not None else frame['日期'].max()
+    frame = _filter(frame[frame['日期'] == period], params)
+    columns = (['车型'] if level == 'model' else []) + ['日期', '销量', '去年同期', '同比增长率']
+    return {'level': level, 'period': period.strftime('%Y-%m'), 'data': _records(frame[columns])}
+
+
+def query_shares(tables, params):
+    """周度数据中各车型在品牌内的销量占比"""
+    frame = _filter(tables['model_weekly_share'], params)
+    return {'data': _records(frame[['车型', '销量', '占比']])}
+
+
+ENDPOINTS = {
+    '/api/brands': query_brands,
+    '/api/brand-totals': query_brand_totals,
+    '/api/models': query_models,
+    '/api/yoy': query_yoy,
+    '/api/shares': query_shares,
+}
+
+
+class SalesApiServer(ThreadingHTTPServer):
+    """销量数据的JSON查询服务，响应按数据版本和查询参数缓存"""
+
+    daemon_threads = True
+
+    def __init__(self, address, cache_size=1024, check_interval=5.0):
+        super().__init__(address, SalesApiHandler)
+        self.data = SalesData(check_interval)
+        self.cache = LRUCache(cache_size)
+        self.cache_version = None
+
+    def etag(self, version, path, query):
+        digest = hashlib.sha1(f'{version}|{path}|{query}'.encode('utf-8')).hexdigest()[:20]
+        return f'"{digest}"'
+
+    def respond(self, path, params):
+        """返回 (数据版本, ETag, 响应体)，响应体优先从缓存中取"""
+        version, tables = self.data.current()
+        if version != self.cache_version:
+            # 数据更新后旧版本的结果不会再被命中，直接清空
+            self.cache.clear()
+            self.cache_version = version
+        query = tuple(sorted((key, tuple(values)) for key, values in params.items()))
+        etag = self.etag(version, path, query)
+        body = self.cache.get((version, path, query))
+        if body is None:
+            result = ENDPOINTS[path](tables, params)
+            body = json.dumps({'version': version, **result}, ensure_ascii=False).encode('utf-8')
+            self.cache.put((version, path, query), body)
+        return version, etag, body
+
+    @property
+    def base_url(self):
+        return f'http://{self.server_address[0]}:{self.server_address[1]}'
+
+
+class SalesApiHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        path = parsed.path.rstrip('/') or '/'
+        params = parse_qs(parsed.query)
+
+        if path == '/api/health':
+            version, _ = self.server.data.current()
+            return self._send(200, json.dumps({'version': version, 'cache': self.server.cache.info()}).encode('utf-8'))
+        if path not in ENDPOINTS:
+            return self._send(404, self._error(f'未知的接口: {path}，可用接口: {", ".join(ENDPOINTS)}'))
+
+        try:
+            _, etag, body = self.server.respond(path, params)
+        except QueryError as e:
+            return self._send(400, self._error(str(e)))
+        except Exception as e:
+            return self._send(500, self._error(f'查询出错: {e}'))
+
+        # 客户端持有的结果仍是当前数据版本时返回304
+        if etag in [tag.strip() for tag in self.headers.get('If-None-Match', '').split(',')]:
+            return self._send(304, b'', {'ETag': etag})
+        self._send(200, body, {'ETag': etag})
+
+    def _error(self, message):
+        return json.dumps({'error': message}, ensure_ascii=False).encode('utf-8')
+
+    def _send(self, status, payload, headers=None):
+        self.send_response(status)
+        if status != 304:
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(payload)))
+        self.send_header('Cache-Control', 'no-cache')
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        if status != 304:
+            self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="汽车销量数据的JSON查询接口")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8600)
+    parser.add_argument('--cache-size', type=int, default=1024, help='缓存的查询结果数量')
+    parser.add_argument('--check-interval', type=float, default=5.0, help='检查数据版本的间隔（秒）')
+    args = parser.parse_args()
+
+    server = SalesApiServer((args.host, args.port), cache_size=args.cache_size, check_interval=args.check_interval)
+    version, _ = server.data.current()
+    print(f"查询接口已启动: {server.base_url}，数据版本 {version}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -1,8 +1,12 @@
+from contextlib import closing
+
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from datetime import datetime
+import data_store
+import cube
+import forecast
+import rolling_analytics
+import sections
+import sql_backend
 
 # 设置页面配置
 st.set_page_config(
@@ -65,108 +69,164 @@ st.markdown("""
 st.markdown('<p class="title-text">🚗 汽车销量数据分析</p>', unsafe_allow_html=True)
 
 # 读取数据
+@st.cache_resource(max_entries=2)
+def load_cube(version):
+    # 优先读取采集时预计算的聚合结果，不存在或与数据版本不一致时在内存中构建
+    # 各部分共享同一份只读的表，不在每次重新运行时复制
+    return cube.load_tables(version)
+
+# 设置 SALES_BACKEND=sqlite 时从数据库按需查询，品牌和时间条件及汇总在数据库中完成
+USE_SQL = sql_backend.enabled()
+
+def current_version():
+    if USE_SQL:
+        with closing(sql_backend.connect()) as conn:
+            return sql_backend.data_version(conn)
+    return data_store.data_version()
+
 @st.cache_data
-def load_data():
-    # 读取月度CSV文件
-    df = pd.read_csv("汽车销量数据.csv")
-    
-    # 将宽表格转换为长表格，保留汽车品牌和车型列
-    df_melted = df.melt(
-        id_vars=['汽车品牌', '车型', '售价'],  # 保持不变的列
-        var_name='日期',                    # 日期列名
-        value_name='销量'                   # 销量列名
-    )
-    
-    # 将日期列转换为datetime类型
-    df_melted['日期'] = pd.to_datetime(df_melted['日期'].astype(str), format='%Y%m')
-    
-    # 重命名列以匹配之前的代码
-    df_melted = df_melted.rename(columns={'汽车品牌': '品牌'})
-    
-    # 将销量中的空值替换为0
-    df_melted['销量'] = df_melted['销量'].fillna(0)
-    
-    # 读取周度CSV文件
-    df_weekly_raw = pd.read_csv("汽车销量数据_autohome_周度.csv")
-    
-    # 将周度数据转换为长格式
-    df_weekly = df_weekly_raw.melt(
-        id_vars=['汽车品牌', '车型', '售价'],  # 保持不变的列
-        var_name='日期',                    # 日期列名
-        value_name='销量'                   # 销量列名
+def catalog(version):
+    # 页面控件的选项：品牌列表和各数据源的周期
+    if USE_SQL:
+        with closing(sql_backend.connect()) as conn:
+            return {
+                'brands': sql_backend.brands(conn, 'dongchedi'),
+                'monthly_periods': sql_backend.periods(conn, 'dongchedi'),
+                'weekly_brands': sql_backend.brands(conn, 'autohome'),
+                'weekly_periods': sql_backend.periods(conn, 'autohome'),
+            }
+    tables = load_cube(version)
+    return {
+        'brands': sorted(tables['brand_monthly_wide'].index),
+        'monthly_periods': tables['model_monthly_wide'].columns,
+        'weekly_brands': sorted(tables['model_weekly_wide'].index.get_level_values('品牌').unique()),
+        'weekly_periods': tables['model_weekly_wide'].columns,
+    }
+
+def brand_source(version, brands):
+    # 使用数据库时只取出所选品牌的月度总销量
+    if not USE_SQL:
+        return load_cube(version)
+    with closing(sql_backend.connect()) as conn:
+        return sql_backend.brand_tables(conn, brands)
+
+def model_source(version, source, brand, start, end):
+    # 使用数据库时只取出该品牌在可见时间范围内的车型销量
+    if not USE_SQL:
+        return load_cube(version)
+    with closing(sql_backend.connect()) as conn:
+        return sql_backend.model_tables(conn, source, brand, start, end)
+
+def model_matrices(version):
+    # 所有车型的月度和周度 车型×日期 宽表
+    if USE_SQL:
+        with closing(sql_backend.connect()) as conn:
+            return sql_backend.model_wide(conn, 'dongchedi'), sql_backend.model_wide(conn, 'autohome')
+    tables = load_cube(version)
+    return tables['model_monthly_wide'], tables['model_weekly_wide']
+
+@st.cache_resource(max_entries=2)
+def load_forecasts(version):
+    # 所有车型的预测在一次向量化计算中完成，按数据版本缓存，各部分共享
+    monthly, weekly = model_matrices(version)
+    return {
+        'dongchedi': forecast.forecast_wide(monthly, 'M').set_index('品牌'),
+        'autohome': forecast.forecast_wide(weekly, 'W').set_index('品牌'),
+    }
+
+@st.cache_resource(max_entries=2)
+def load_analytics(version):
+    # 所有车型的销量前缀和按数据版本计算一次，滑动平均和累计指标的每个点直接由前缀和相减得到
+    monthly, weekly = model_matrices(version)
+    return {
+        'dongchedi': rolling_analytics.RollingAnalytics(monthly, 'M'),
+        'autohome': rolling_analytics.RollingAnalytics(weekly, 'W'),
+    }
+
+def metric_wide(version, source, brand, metric):
+    # 选择销量时不需要额外计算
+    if metric == '销量':
+        return None
+    freq = 'M' if source == 'dongchedi' else 'W'
+    return load_analytics(version)[source].metric(metric, freq, brand)
+
+# 各部分的图表和表格按数据版本和控件取值缓存，切换回之前的选择时不再重新计算
+@st.cache_data(max_entries=64)
+def model_monthly_view(version, brand, start, end, metric='销量'):
+    return sections.model_monthly(model_source(version, 'dongchedi', brand, start, end), brand, start, end,
+                                  load_forecasts(version)['dongchedi'],
+                                  metric, metric_wide(version, 'dongchedi', brand, metric))
+
+@st.cache_data(max_entries=16)
+def brand_total_view(version, brands):
+    return sections.brand_total(brand_source(version, brands), list(brands))
+
+@st.cache_data(max_entries=64)
+def brand_compare_view(version, brands, growth_type):
+    return sections.brand_compare(brand_source(version, brands), list(brands), growth_type)
+
+@st.cache_data(max_entries=64)
+def model_weekly_view(version, brand, start, end, metric='销量'):
+    return sections.model_weekly(model_source(version, 'autohome', brand, start, end), brand, start, end,
+                                 load_forecasts(version)['autohome'],
+                                 metric, metric_wide(version, 'autohome', brand, metric))
+
+@st.cache_resource(max_entries=2)
+def price_source(version):
+    # 价格区间部分的表，使用数据库时在数据库中汇总，不依赖预计算结果
+    if not USE_SQL:
+        return load_cube(version)
+    with closing(sql_backend.connect()) as conn:
+        return sql_backend.price_tables(conn)
+
+@st.cache_data(max_entries=64)
+def price_segments_view(version, low, high):
+    return sections.price_segments(price_source(version), low, high)
+
+def select_range(label, periods, date_format, key):
+    # 选择图表的可见时间范围，只有一个周期时不显示
+    if len(periods) < 2:
+        return None, None
+    periods = periods.sort_values()
+    return st.slider(
+        label,
+        min_value=periods[0].to_pydatetime(),
+        max_value=periods[-1].to_pydatetime(),
+        value=(periods[0].to_pydatetime(), periods[-1].to_pydatetime()),
+        format=date_format,
+        key=key
     )
-    
-    # 将日期列转换为datetime类型
-    df_weekly['日期'] = pd.to_datetime(df_weekly['日期'])
-    
-    # 添加周数列
-    df_weekly['周数'] = df_weekly['日期'].dt.isocalendar().week
-    
-    # 重命名列
-    df_weekly = df_weekly.rename(columns={'汽车品牌': '品牌'})
-    
-    # 将销量中的空值替换为0
-    df_weekly['销量'] = df_weekly['销量'].fillna(0)
-    
-    return df_melted[['日期', '品牌', '车型', '销量']], df_weekly[['日期', '品牌', '车型', '售价', '周数', '销量']]
 
-# 加载数据
-try:
-    df, df_weekly = load_data()
+def show_table(table, config):
+    st.dataframe(
+        table,
+        column_config=config,
+        use_container_width=True,
+        height=400
+    )
 
+# 每个部分是独立的片段，部分内的控件变化只重新运行该部分
+@st.fragment
+def model_monthly_section(version, brands):
     # 1. 单品牌车型销量分析
     st.markdown('<p class="header-text">1️⃣ 单品牌车型销量分析</p>', unsafe_allow_html=True)
     
     # 选择品牌
-    brands = sorted(df['品牌'].unique())
     selected_brand = st.selectbox('选择品牌', brands)
+    start, end = select_range('显示时间范围', catalog(version)['monthly_periods'], 'YYYY-MM', 'monthly_range')
+    # 选择显示的指标：月度销量、滑动平均或累计销量
+    metric = st.radio('显示指标', ['销量', *rolling_analytics.METRICS['M']], horizontal=True, key='monthly_metric')
+    fig_models, model_monthly, config = model_monthly_view(version, selected_brand, start, end, metric)
     
     # 创建两列布局
     col1, col2 = st.columns(2)
-    
     with col1:
-        # 过滤选定品牌的数据
-        brand_data = df[df['品牌'] == selected_brand]
-        
-        # 创建车型销量趋势图
-        fig_models = px.line(
-            brand_data,
-            x='日期',
-            y='销量',
-            color='车型',
-            title=f'{selected_brand}各车型销量趋势',
-            labels={'日期': '时间', '销量': '月度销量'}
-        )
-        
-        # 添加数据标签
-        fig_models.update_traces(
-            mode='lines+markers+text',
-            textposition='top center'
-        )
-        
         st.plotly_chart(fig_models, use_container_width=True)
-    
     with col2:
-        # 创建车型月度销量表格
-        model_monthly = brand_data.pivot_table(
-            index='车型',
-            columns='日期',
-            values='销量',
-            aggfunc='sum'
-        ).round(0)
-        
-        # 添加合计行
-        model_monthly.loc['合计'] = model_monthly.sum()
-        
-        # 格式化数字显示
-        formatted_model_monthly = model_monthly.map(lambda x: f"{x:,.0f}" if pd.notnull(x) else "")
-        
-        st.dataframe(
-            formatted_model_monthly,
-            use_container_width=True,
-            height=400
-        )
+        show_table(model_monthly, config)
 
+@st.fragment
+def brand_total_section(version, brands):
     # 2. 品牌总销量分析
     st.markdown('<p class="header-text">2️⃣ 品牌总销量分析</p>', unsafe_allow_html=True)
     
@@ -176,108 +236,16 @@ try:
         options=brands,
         default=brands  # 默认选择所有品牌
     )
+    fig_brand_total, brand_monthly_table, config = brand_total_view(version, tuple(selected_brands_total))
     
     col3, col4 = st.columns(2)
-    
     with col3:
-        # 计算所选品牌的月度总销量
-        brand_total = df[df['品牌'].isin(selected_brands_total)].groupby(['日期', '品牌'])['销量'].sum().reset_index()
-        
-        # 计算所选品牌每个月的总销量和去年同期销量
-        monthly_sum = brand_total.groupby('日期')['销量'].sum().reset_index()
-        monthly_sum['去年同期'] = monthly_sum['销量'].shift(12)
-        monthly_sum['同比增长率'] = (monthly_sum['销量'] - monthly_sum['去年同期']) / monthly_sum['去年同期'] * 100
-        
-        # 创建堆叠柱状图
-        fig_brand_total = go.Figure()
-        
-        # 添加每个品牌的堆叠柱状图
-        for brand in selected_brands_total:
-            brand_data = brand_total[brand_total['品牌'] == brand]
-            fig_brand_total.add_trace(
-                go.Bar(
-                    name=brand,
-                    x=brand_data['日期'],
-                    y=brand_data['销量'],
-                    showlegend=True
-                )
-            )
-        
-        # 添加同比增长率折线图
-        fig_brand_total.add_trace(
-            go.Scatter(
-                name='同比增长率',
-                x=monthly_sum['日期'],
-                y=monthly_sum['同比增长率'],
-                yaxis='y2',
-                line=dict(color='#E53935', width=2.5),  # 加粗红色线条
-                mode='lines+markers',
-                marker=dict(size=8)
-            )
-        )
-        
-        # 更新布局
-        fig_brand_total.update_layout(
-            barmode='stack',
-            yaxis=dict(
-                title='销量',
-                side='left',
-                titlefont=dict(size=16),  # 增大轴标题字体
-                tickfont=dict(size=14)    # 增大刻度字体
-            ),
-            yaxis2=dict(
-                title='同比增长率 (%)',
-                side='right',
-                overlaying='y',
-                tickformat='.1f',
-                titlefont=dict(size=16),
-                tickfont=dict(size=14)
-            ),
-            xaxis=dict(
-                title='时间',
-                titlefont=dict(size=16),
-                tickfont=dict(size=14)
-            ),
-            showlegend=True,
-            legend=dict(
-                orientation="h",
-                yanchor="bottom",
-                y=1.02,
-                xanchor="right",
-                x=1,
-                font=dict(size=14)  # 增大图例字体
-            ),
-            hovermode='x unified',
-            plot_bgcolor='white',  # 设置白色背景
-            paper_bgcolor='white'
-        )
-        
-        # 设置y轴从0开始
-        fig_brand_total.update_yaxes(rangemode="tozero")
-        
         st.plotly_chart(fig_brand_total, use_container_width=True)
-    
     with col4:
-        # 创建品牌月度销量表格
-        brand_monthly_table = brand_total.pivot_table(
-            index='品牌',
-            columns='日期',
-            values='销量',
-            aggfunc='sum'
-        ).round(0)
-        
-        # 添加合计行
-        brand_monthly_table.loc['合计'] = brand_monthly_table.sum()
-        
-        # 格式化数字显示
-        formatted_brand_monthly = brand_monthly_table.map(lambda x: f"{x:,.0f}" if pd.notnull(x) else "")
-        
-        st.dataframe(
-            formatted_brand_monthly,
-            use_container_width=True,
-            height=400
-        )
+        show_table(brand_monthly_table, config)
 
+@st.fragment
+def brand_compare_section(version, brands):
     # 3. 品牌对比分析
     st.markdown('<p class="header-text">3️⃣ 品牌对比分析</p>', unsafe_allow_html=True)
     
@@ -288,224 +256,91 @@ try:
         default=brands[:2]  # 默认选择前两个品牌
     )
     
+    # 选择增长率类型，同比和环比均按真实日历对齐
+    growth_type = st.radio('增长率类型', ['同比', '环比'], horizontal=True)
+    
     if len(selected_brands) < 2:
         st.warning('请至少选择两个品牌进行对比')
-    else:
-        # 获取所有选中品牌的数据
-        compare_data = []
-        for brand in selected_brands:
-            brand_data = df[df['品牌'] == brand].groupby('日期')['销量'].sum().reset_index()
-            brand_data['品牌'] = brand
-            brand_data['去年同期'] = brand_data['销量'].shift(12)
-            brand_data['同比增长率'] = (brand_data['销量'] - brand_data['去年同期']) / brand_data['去年同期'] * 100
-            compare_data.append(brand_data)
-        
-        # 合并所有品牌数据
-        all_compare_data = pd.concat(compare_data)
-        
-        col7, col8 = st.columns(2)
-        
-        with col7:
-            # 创建销量对比图
-            fig_compare = go.Figure()
-            
-            # 为每个品牌添加柱状图
-            for i, brand in enumerate(selected_brands):
-                brand_data = all_compare_data[all_compare_data['品牌'] == brand]
-                fig_compare.add_trace(
-                    go.Bar(
-                        name=brand,
-                        x=brand_data['日期'],
-                        y=brand_data['销量'],
-                        text=brand_data['销量'].round(0),
-                        textposition='auto',
-                        offsetgroup=i
-                    )
-                )
-            
-            # 更新布局
-            fig_compare.update_layout(
-                title='品牌销量对比',
-                barmode='group',
-                yaxis_title='销量',
-                xaxis_title='时间',
-                showlegend=True,
-                legend=dict(
-                    orientation="h",
-                    yanchor="bottom",
-                    y=1.02,
-                    xanchor="right",
-                    x=1
-                ),
-                hovermode='x unified'
-            )
-            
-            st.plotly_chart(fig_compare, use_container_width=True)
-        
-        with col8:
-            # 创建增长率对比图
-            fig_growth = go.Figure()
-            
-            # 添加0%基准线
-            fig_growth.add_hline(
-                y=0, 
-                line_dash="dash", 
-                line_color="gray",
-                annotation_text="0%",
-                annotation_position="left"
-            )
-            
-            # 为每个品牌添加增长率折线
-            for brand in selected_brands:
-                brand_data = all_compare_data[all_compare_data['品牌'] == brand]
-                fig_growth.add_trace(
-                    go.Scatter(
-                        name=brand,
-                        x=brand_data['日期'],
-                        y=brand_data['同比增长率'],
-                        mode='lines+markers',
-                        line=dict(width=2),
-                        marker=dict(size=8)
-                    )
-                )
-            
-            # 更新布局
-            fig_growth.update_layout(
-                title='品牌同比增长率对比',
-                yaxis_title='同比增长率 (%)',
-                xaxis_title='时间',
-                showlegend=True,
-                legend=dict(
-                    orientation="h",
-                    yanchor="bottom",
-                    y=1.02,
-                    xanchor="right",
-                    x=1
-                ),
-                hovermode='x unified'
-            )
-            
-            # 设置y轴格式
-            fig_growth.update_yaxes(tickformat='.1f')
-            
-            st.plotly_chart(fig_growth, use_container_width=True)
-        
-        # 创建详细数据表格
-        st.markdown('<p class="subheader-text">详细对比数据</p>', unsafe_allow_html=True)
-        
-        # 数据透视表
-        compare_table = all_compare_data.pivot_table(
-            index=['日期'],
-            columns=['品牌'],
-            values=['销量', '同比增长率'],
-            aggfunc={'销量': 'sum', '同比增长率': 'first'}
-        ).round(1)
-        
-        # 重新排序列以使销量和增长率交替显示
-        new_columns = []
-        for brand in selected_brands:
-            new_columns.extend([('销量', brand), ('同比增长率', brand)])
-        compare_table = compare_table[new_columns]
-        
-        # 格式化数据显示
-        formatted_compare_table = compare_table.copy()
-        for brand in selected_brands:
-            formatted_compare_table[('销量', brand)] = formatted_compare_table[('销量', brand)].map(lambda x: f"{x:,.0f}" if pd.notnull(x) else "")
-            formatted_compare_table[('同比增长率', brand)] = formatted_compare_table[('同比增长率', brand)].map(lambda x: f"{x:.1f}%" if pd.notnull(x) else "")
-        
-        st.dataframe(
-            formatted_compare_table.sort_index(ascending=False),
-            use_container_width=True,
-            height=400
-        )
+        return
+    fig_compare, fig_growth, compare_table, config = brand_compare_view(version, tuple(selected_brands), growth_type)
+    
+    col7, col8 = st.columns(2)
+    with col7:
+        st.plotly_chart(fig_compare, use_container_width=True)
+    with col8:
+        st.plotly_chart(fig_growth, use_container_width=True)
+    
+    # 详细数据表格
+    st.markdown('<p class="subheader-text">详细对比数据</p>', unsafe_allow_html=True)
+    show_table(compare_table, config)
 
+@st.fragment
+def model_weekly_section(version):
     # 4. 周度数据分析
     st.markdown('<p class="header-text">4️⃣ 周度数据分析</p>', unsafe_allow_html=True)
     
     # 创建品牌选择器
-    weekly_brands = sorted(df_weekly['品牌'].unique())
     selected_brand_models = st.selectbox(
         '选择品牌查看车型销量',
-        options=weekly_brands,
+        options=catalog(version)['weekly_brands'],
         key='weekly_brand_models'
     )
+    start, end = select_range('显示时间范围', catalog(version)['weekly_periods'], 'YYYY-MM-DD', 'weekly_range')
+    metric = st.radio('显示指标', ['销量', *rolling_analytics.METRICS['W']], horizontal=True, key='weekly_metric')
+    fig_models, fig_shares, model_pivot, config = model_weekly_view(version, selected_brand_models, start, end, metric)
     
     # 创建两列布局
     col_weekly1, col_weekly2 = st.columns(2)
-    
     with col_weekly1:
-        # 过滤选定品牌的车型数据
-        model_data = df_weekly[df_weekly['品牌'] == selected_brand_models]
-        
-        # 创建车型销量趋势图
-        fig_models = px.line(
-            model_data,
-            x='日期',
-            y='销量',
-            color='车型',
-            title=f'{selected_brand_models}各车型周度销量趋势',
-            labels={'日期': '日期', '销量': '周度销量'}
-        )
-        
-        # 添加数据标签和调整布局
-        fig_models.update_traces(mode='lines+markers')
-        fig_models.update_layout(
-            xaxis_title='日期',
-            yaxis_title='销量',
-            hovermode='x unified',
-            legend=dict(
-                orientation="h",
-                yanchor="bottom",
-                y=1.02,
-                xanchor="right",
-                x=1
-            )
-        )
-        
         st.plotly_chart(fig_models, use_container_width=True)
-    
     with col_weekly2:
-        # 计算车型占比
-        model_shares = model_data.groupby('车型')['销量'].sum()
-        total_sales = model_shares.sum()
-        model_shares = (model_shares / total_sales * 100).round(1)
-        
-        # 创建占比饼图
-        fig_shares = px.pie(
-            values=model_shares.values,
-            names=model_shares.index,
-            title=f'{selected_brand_models}车型销量占比分析'
-        )
-        
-        # 更新布局
-        fig_shares.update_traces(textposition='inside', textinfo='percent+label')
-        fig_shares.update_layout(showlegend=False)
-        
         st.plotly_chart(fig_shares, use_container_width=True)
-        
+    
     # 显示详细数据表格
     st.markdown('<p class="subheader-text">车型销量明细</p>', unsafe_allow_html=True)
+    show_table(model_pivot, config)
+
+@st.fragment
+def price_segments_section(version):
+    # 5. 价格区间分析
+    st.markdown('<p class="header-text">5️⃣ 价格区间分析</p>', unsafe_allow_html=True)
     
-    # 创建数据透视表
-    model_pivot = model_data.pivot_table(
-        index='车型',
-        columns='日期',
-        values='销量',
-        aggfunc='sum'
-    ).round(0)
+    # 选择中间价范围（万元）
+    low, high = price_source(version)['price_index'].bounds()
+    if low is None:
+        st.warning('没有可解析的售价数据')
+        return
+    low, high = st.slider(
+        '价格范围（万元，按售价中间价）',
+        min_value=float(low // 1),
+        max_value=float(-(-high // 1)),
+        value=(float(low // 1), float(-(-high // 1))),
+        step=1.0,
+        key='price_range'
+    )
+    fig_bands, fig_brands, models, config = price_segments_view(version, low, high)
     
-    # 添加合计行
-    model_pivot.loc['合计'] = model_pivot.sum()
+    col_price1, col_price2 = st.columns(2)
+    with col_price1:
+        st.plotly_chart(fig_bands, use_container_width=True)
+    with col_price2:
+        st.plotly_chart(fig_brands, use_container_width=True)
     
-    # 格式化数字显示
-    formatted_model_pivot = model_pivot.map(lambda x: f"{x:,.0f}" if pd.notnull(x) else "")
+    # 显示所选价格范围内的车型
+    st.markdown('<p class="subheader-text">价格范围内车型</p>', unsafe_allow_html=True)
+    show_table(models, config)
+
+# 加载数据
+try:
+    version = current_version()
+    brands = catalog(version)['brands']
     
-    st.dataframe(
-        formatted_model_pivot,
-        use_container_width=True,
-        height=400
-    )
+    model_monthly_section(version, brands)
+    brand_total_section(version, brands)
+    brand_compare_section(version, brands)
+    model_weekly_section(version)
+    price_segments_section(version)
 
 except Exception as e:
     st.error(f"数据加载或处理过程中出现错误：{str(e)}")
-    st.info("请确保'汽车销量数据.csv'文件在正确的位置。")  
\ No newline at end of file
+    st.info("请确保'汽车销量数据.csv'文件在正确的位置。")
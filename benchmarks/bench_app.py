@@ -0,0 +1,144 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+# 项目根目录下的模块
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+import cube
+import data_store
+from growth import growth_table
+from table_format import number_table
+
+from generate_data import write_dataset
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+
+def best_of(fn, repeat):
+    """运行 repeat 次，返回最短用时（秒）和最后一次的结果"""
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def run_suite(models, periods, weekly_periods, brands, repeat):
+    """生成指定规模的数据，依次测量读取转换、聚合、透视和表格格式化的用时"""
+    timings = {}
+
+    def measure(name, fn):
+        timings[name], result = best_of(fn, repeat)
+        print(f"  {name:<28} {timings[name] * 1000:10.1f} ms")
+        return result
+
+    with tempfile.TemporaryDirectory() as workdir:
+        monthly_csv, weekly_csv = write_dataset(workdir, models, periods, weekly_periods, brands)
+
+        # 读取宽表并转换为长表（load_data 在没有长格式存储时的路径）
+        monthly = measure('load_monthly_csv', lambda: data_store.wide_to_long(pd.read_csv(monthly_csv), 'dongchedi'))
+        weekly = measure('load_weekly_csv', lambda: data_store.wide_to_long(pd.read_csv(weekly_csv), 'autohome'))
+
+        # 长格式存储写入临时目录，结束后恢复原来的存储目录
+        store_dir = data_store.STORE_DIR
+        data_store.STORE_DIR = os.path.join(workdir, 'sales')
+        try:
+            data_store.write_long(monthly, 'dongchedi')
+            data_store.write_long(weekly, 'autohome')
+            measure('store_read_monthly', lambda: data_store.read_store('dongchedi', columns=['period', 'brand', 'model', 'sales']))
+
+            df, df_weekly = measure('to_app_frames', lambda: data_store.to_app_frames(monthly, weekly))
+
+            # 页面中的聚合
+            measure('groupby_brand_totals', lambda: df.groupby(['日期', '品牌'], observed=True)['销量'].sum())
+            measure('growth_brand_monthly', lambda: growth_table(df, ['品牌'], 'M'))
+            measure('growth_model_monthly', lambda: growth_table(df, ['品牌', '车型'], 'M'))
+            tables = measure('build_cube', lambda: cube.build_cube(df, df_weekly))
+
+            # 透视表
+            brand = df['品牌'].value_counts().index[0]
+            brand_data = df[df['品牌'] == brand]
+            measure('pivot_table_brand', lambda: brand_data.pivot_table(index='车型', columns='日期', values='销量', aggfunc='sum', observed=True))
+            measure('pivot_table_weekly_all', lambda: df_weekly.pivot_table(index='车型', columns='日期', values='销量', aggfunc='sum', observed=True))
+            model_wide = measure('cube_to_wide_models', lambda: cube.to_wide(tables['model_monthly'], ['品牌', '车型']))
+
+            # 表格格式化
+            brand_table = model_wide.loc[brand].round(0)
+            measure('format_brand_table', lambda: number_table(brand_table, date_format='%Y-%m'))
+        finally:
+            data_store.STORE_DIR = store_dir
+    return timings
+
+
+def compare(timings, baseline, tolerance):
+    """与基准结果比较，返回超过容差的项目"""
+    regressions = []
+    for name, seconds in timings.items():
+        base = baseline.get(name)
+        if base and seconds > base * (1 + tolerance):
+            regressions.append((name, base, seconds))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="app.py 数据读取和聚合路径的基准测试")
+    parser.add_argument('--models', type=int, default=2000)
+    parser.add_argument('--periods', type=int, default=120)
+    parser.add_argument('--weekly-periods', type=int, help='周度数据的周期数，默认与 --periods 相同')
+    parser.add_argument('--brands', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--tolerance', type=float, default=0.5, help='允许比基准慢的比例，超过则视为性能回退')
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--update-baseline', action='store_true', help='用本次结果覆盖基准结果')
+    args = parser.parse_args()
+
+    config = {
+        'models': args.models,
+        'periods': args.periods,
+        'weekly_periods': args.weekly_periods or args.periods,
+        'brands': args.brands,
+    }
+    print(f"数据规模: {config}")
+    timings = run_suite(args.models, args.periods, args.weekly_periods, args.brands, args.repeat)
+
+    if args.update_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump({
+                'config': config,
+                'python': platform.python_version(),
+                'pandas': pd.__version__,
+                'machine': platform.machine(),
+                'results': {name: round(seconds, 6) for name, seconds in timings.items()},
+            }, f, ensure_ascii=False, indent=2)
+        print(f"基准结果已写入 {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("没有基准结果，使用 --update-baseline 生成")
+        return 0
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    if baseline.get('config') != config:
+        print(f"数据规模与基准结果不同（基准: {baseline.get('config')}），跳过比较")
+        return 0
+
+    regressions = compare(timings, baseline['results'], args.tolerance)
+    for name, base, seconds in regressions:
+        print(f"性能回退: {name} 基准 {base * 1000:.1f} ms，本次 {seconds * 1000:.1f} ms")
+    if regressions:
+        return 1
+    print("没有发现性能回退")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,64 @@
+import argparse
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+# 与采集脚本输出一致的宽表文件名
+MONTHLY_CSV = '汽车销量数据.csv'
+WEEKLY_CSV = '汽车销量数据_autohome_周度.csv'
+
+
+def monthly_periods(n_periods, start=datetime(2015, 1, 1)):
+    """生成 n_periods 个 %Y%m 格式的月份列"""
+    months = pd.date_range(start, periods=n_periods, freq='MS')
+    return list(months.strftime('%Y%m'))
+
+
+def weekly_periods(n_periods, start=datetime(2020, 1, 7)):
+    """生成 n_periods 个从周二开始的 %Y-%m-%d 格式的周度列"""
+    return [(start + timedelta(weeks=i)).strftime('%Y-%m-%d') for i in range(n_periods)]
+
+
+def generate_wide(n_models, periods, n_brands=50, seed=0):
+    """生成与采集结果相同结构的宽表：汽车品牌、车型、售价加每个周期一列销量"""
+    rng = np.random.default_rng(seed)
+    brand_index = np.arange(n_models) % n_brands
+    low = rng.uniform(5, 60, n_models).round(2)
+    fixed = pd.DataFrame({
+        '汽车品牌': [f'品牌{i}' for i in brand_index],
+        '车型': [f'品牌{b}车型{i}' for i, b in enumerate(brand_index)],
+        '售价': [f'{a:.2f}-{a + rng.uniform(1, 10):.2f}万' for a in low],
+    })
+    # 每个车型有自己的销量水平，并带有季节波动和噪声，部分车型上市前为空
+    level = rng.lognormal(6, 1.2, n_models)[:, None]
+    season = 1 + 0.2 * np.sin(np.arange(len(periods)) * 2 * np.pi / 12)[None, :]
+    sales = np.round(level * season * rng.uniform(0.7, 1.3, (n_models, len(periods))))
+    launch = rng.integers(0, max(1, len(periods) // 2), n_models)
+    sales[np.arange(len(periods))[None, :] < launch[:, None]] = np.nan
+    return pd.concat([fixed, pd.DataFrame(sales, columns=periods)], axis=1)
+
+
+def write_dataset(directory, n_models, n_periods, n_weekly_periods=None, n_brands=50, seed=0):
+    """在 directory 中写入月度和周度宽表CSV，返回两个文件路径"""
+    os.makedirs(directory, exist_ok=True)
+    monthly_path = os.path.join(directory, MONTHLY_CSV)
+    weekly_path = os.path.join(directory, WEEKLY_CSV)
+    generate_wide(n_models, monthly_periods(n_periods), n_brands, seed).to_csv(
+        monthly_path, index=False, encoding='utf-8-sig')
+    generate_wide(n_models, weekly_periods(n_weekly_periods or n_periods), n_brands, seed + 1).to_csv(
+        weekly_path, index=False, encoding='utf-8-sig')
+    return monthly_path, weekly_path
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="生成与采集结果结构相同的合成宽表CSV")
+    parser.add_argument('--models', type=int, default=10000)
+    parser.add_argument('--periods', type=int, default=300)
+    parser.add_argument('--weekly-periods', type=int, help='周度数据的周期数，默认与 --periods 相同')
+    parser.add_argument('--brands', type=int, default=50)
+    parser.add_argument('--output', default='bench_data')
+    args = parser.parse_args()
+    for path in write_dataset(args.output, args.models, args.periods, args.weekly_periods, args.brands):
+        print(f"已生成 {path}")
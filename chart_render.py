@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+# 每条曲线在可见范围内最多保留的点数，超过时按LTTB降采样
+MAX_POINTS_PER_SERIES = 400
+# 图中总点数超过该值时改用WebGL渲染，并去掉数据点标记和数据标签
+WEBGL_THRESHOLD = 2000
+
+
+def _as_float(values):
+    """将日期或数值序列转换为浮点数组，用于计算三角形面积"""
+    values = pd.Series(values)
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.to_numpy('datetime64[ns]').astype('int64').astype(float)
+    return values.to_numpy(dtype=float)
+
+
+def lttb(x, y, threshold):
+    """Largest-Triangle-Three-Buckets 降采样，返回保留的点的位置
+
+    x 需已排序。首尾两点始终保留，中间的点分为 threshold-2 个桶，
+    每个桶内选出与上一个选中点、下一个桶均值构成的三角形面积最大的点，保留峰谷形状。
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = _as_float(x)
+    y = np.nan_to_num(_as_float(y))
+
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(area.argmax())
+        selected[i + 1] = a
+    return selected
+
+
+def visible_range(frame, x, start=None, end=None):
+    """只保留可见时间范围内的数据"""
+    mask = pd.Series(True, index=frame.index)
+    if start is not None:
+        mask &= frame[x] >= pd.Timestamp(start)
+    if end is not None:
+        mask &= frame[x] <= pd.Timestamp(end)
+    return frame[mask]
+
+
+def downsample(frame, x, y, group=None, max_points=MAX_POINTS_PER_SERIES):
+    """按分组对每条曲线分别做LTTB降采样，点数不超过 max_points 的曲线保持不变"""
+    frame = frame.sort_values([group, x] if group else x)
+    if group is None:
+        return frame.iloc[lttb(frame[x], frame[y], max_points)]
+    positions = []
+    offset = 0
+    for _, series in frame.groupby(group, sort=False, observed=True):
+        positions.append(offset + lttb(series[x], series[y], max_points))
+        offset += len(series)
+    if not positions:
+        return frame
+    return frame.iloc[np.concatenate(positions)]
+
+
+def use_webgl(points):
+    return points > WEBGL_THRESHOLD
+
+
+def scatter_trace(points, **kwargs):
+    """按总点数选择 Scattergl 或 Scatter，点数较多时只画线"""
+    if use_webgl(points):
+        kwargs['mode'] = 'lines'
+        kwargs.pop('marker', None)
+        return go.Scattergl(**kwargs)
+    return go.Scatter(**kwargs)
+
+
+def line_chart(frame, x, y, color, mode='lines+markers', start=None, end=None,
+               max_points=MAX_POINTS_PER_SERIES, **kwargs):
+    """按可见范围截取并降采样后绘制多条折线，点数较多时改用WebGL渲染"""
+    frame = downsample(visible_range(frame, x, start, end), x, y, color, max_points)
+    webgl = use_webgl(len(frame))
+    fig = px.line(frame, x=x, y=y, color=color, render_mode='webgl' if webgl else 'svg', **kwargs)
+    fig.update_traces(mode='lines' if webgl else mode)
+    return fig
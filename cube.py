@@ -0,0 +1,107 @@
+import json
+import os
+
+import pandas as pd
+
+import data_store
+from growth import growth_table
+from price_index import PriceIndex, add_price_columns, parse_prices, price_band
+
+# 预计算结果目录
+CUBE_DIR = os.path.join(data_store.DATA_DIR, 'cube')
+TABLES = ['brand_monthly', 'model_monthly', 'model_weekly', 'model_weekly_share', 'model_prices', 'price_band_weekly']
+# 以品牌为索引的表
+BRAND_TABLES = ['brand_monthly', 'model_monthly', 'model_weekly', 'model_weekly_share']
+
+
+def build_cube(df, df_weekly):
+    """根据月度和周度长表预计算页面使用的聚合结果"""
+    # 品牌×月份总销量及同比、环比
+    brand_monthly = growth_table(df, ['品牌'], 'M').reset_index()
+
+    # 车型×周期销量及增长率，同一车型不同售价的行合并
+    model_monthly = growth_table(df, ['品牌', '车型'], 'M').reset_index()
+    model_weekly = growth_table(df_weekly, ['品牌', '车型'], 'W').reset_index()
+
+    # 周度车型销量在品牌内的占比
+    model_weekly_share = df_weekly.groupby(['品牌', '车型'], as_index=False, observed=True)['销量'].sum()
+    brand_sum = model_weekly_share.groupby('品牌', observed=True)['销量'].transform('sum')
+    model_weekly_share['占比'] = (model_weekly_share['销量'] / brand_sum * 100).round(1)
+
+    # 每个 (品牌, 车型, 售价) 的周度总销量，售价解析为数值价格和价格区间
+    model_prices = df_weekly.groupby(['品牌', '车型', '售价'], as_index=False, observed=True)['销量'].sum()
+    model_prices = add_price_columns(model_prices)
+
+    # 价格区间×周的销量，售价只按分类解析一次
+    bands = price_band(parse_prices(df_weekly['售价'])['中间价']).rename('价格区间')
+    price_band_weekly = df_weekly.groupby([bands, '日期'], observed=True)['销量'].sum().reset_index()
+
+    return {
+        'brand_monthly': brand_monthly,
+        'model_monthly': model_monthly,
+        'model_weekly': model_weekly,
+        'model_weekly_share': model_weekly_share,
+        'model_prices': model_prices,
+        'price_band_weekly': price_band_weekly,
+    }
+
+
+def save_cube(cube, version):
+    """保存预计算结果，并记录对应的数据版本"""
+    os.makedirs(CUBE_DIR, exist_ok=True)
+    for name in TABLES:
+        path = os.path.join(CUBE_DIR, f'{name}.parquet')
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        cube[name].to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+    with open(os.path.join(CUBE_DIR, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump({'data_version': version}, f)
+
+
+def load_cube(version):
+    """读取与数据版本一致的预计算结果，不存在或已过期返回None"""
+    try:
+        with open(os.path.join(CUBE_DIR, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('data_version') != version:
+            return None
+        return {name: pd.read_parquet(os.path.join(CUBE_DIR, f'{name}.parquet')) for name in TABLES}
+    except (OSError, ValueError):
+        return None
+
+
+def to_wide(long, index):
+    """将长表展开为以 index 为行、日期为列的宽表，用于按品牌直接取表格"""
+    return long.set_index(index + ['日期'])['销量'].unstack('日期')
+
+
+def load_tables(version=None):
+    """读取（不存在或已过期时构建）预计算结果，并整理为页面使用的形式：按品牌取数的宽表和以品牌为索引的长表"""
+    tables = load_cube(version or data_store.data_version())
+    if tables is None:
+        tables = build_cube(*data_store.load_frames())
+
+    # 展开为宽表，按品牌直接取出表格
+    tables['brand_monthly_wide'] = to_wide(tables['brand_monthly'], ['品牌'])
+    tables['model_monthly_wide'] = to_wide(tables['model_monthly'], ['品牌', '车型'])
+    tables['model_weekly_wide'] = to_wide(tables['model_weekly'], ['品牌', '车型'])
+
+    # 长表以品牌为索引，按品牌取数据
+    for name in BRAND_TABLES:
+        tables[name] = tables[name].set_index('品牌')
+
+    # 按中间价排序的价格索引，价格范围筛选时二分查找
+    tables['price_index'] = PriceIndex(tables['model_prices'])
+    return tables
+
+
+def build_and_save():
+    """采集完成后调用：读取最新数据，构建并保存预计算结果"""
+    version = data_store.data_version()
+    df, df_weekly = data_store.load_frames()
+    save_cube(build_cube(df, df_weekly), version)
+    return version
+
+
+if __name__ == '__main__':
+    print(f"预计算结果已更新，数据版本: {build_and_save()}")
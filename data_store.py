@@ -0,0 +1,199 @@
+import hashlib
+import os
+import shutil
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+# 项目根目录下的数据目录，可通过环境变量 SALES_DATA_DIR 指向其他目录（如基准测试）
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.getenv('SALES_DATA_DIR', os.path.join(ROOT_DIR, 'data'))
+STORE_DIR = os.path.join(DATA_DIR, 'sales')
+
+# 宽表的固定列及其在长表中的列名
+FIXED_COLUMNS = ['汽车品牌', '车型', '售价']
+COLUMN_NAMES = {'汽车品牌': 'brand', '车型': 'model', '售价': 'price'}
+KEY_COLUMNS = ['brand', 'model', 'price', 'period']
+# 每行重复出现的字符串列，在内存中以分类类型保存
+CATEGORY_COLUMNS = ['brand', 'model', 'price']
+
+# 各数据源的宽表文件和周期列格式
+SOURCES = {
+    'dongchedi': {'csv': '汽车销量数据.csv', 'period_format': '%Y%m'},
+    'autohome': {'csv': '汽车销量数据_autohome_周度.csv', 'period_format': '%Y-%m-%d'},
+}
+
+# 分区文件内的列类型，source和year由分区目录给出
+SCHEMA = pa.schema([
+    ('brand', pa.string()),
+    ('model', pa.string()),
+    ('price', pa.string()),
+    ('period', pa.timestamp('ms')),
+    ('sales', pa.int32()),
+])
+
+
+def wide_to_long(wide, source, fill=True):
+    """将一列一个周期的宽表转换为 (brand, model, price, period, sales) 长表
+
+    fill 为假时保留销量中的空值（采集脚本中表示该单元没有获取到），由写入时决定是否补0。
+    """
+    # 固定列先转换为分类类型，展开后每行只保存分类编码
+    wide = wide.astype({column: 'category' for column in FIXED_COLUMNS})
+    long = wide.melt(id_vars=FIXED_COLUMNS, var_name='period', value_name='sales')
+    long = long.rename(columns=COLUMN_NAMES)
+    long['period'] = pd.to_datetime(long['period'].astype(str), format=SOURCES[source]['period_format'])
+    if not fill:
+        return long[KEY_COLUMNS + ['sales']]
+    # 将销量中的空值替换为0
+    long['sales'] = long['sales'].fillna(0).round().astype('int32')
+    return long[KEY_COLUMNS + ['sales']]
+
+
+def _partition_path(source, year):
+    return os.path.join(STORE_DIR, f'source={source}', f'year={year}', 'part-0.parquet')
+
+
+def _write_partition(frame, path):
+    """先写临时文件再重命名，保证分区文件不会处于写了一半的状态"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    frame = frame[SCHEMA.names].astype({column: object for column in CATEGORY_COLUMNS})
+    table = pa.Table.from_pandas(frame, schema=SCHEMA, preserve_index=False)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    pq.write_table(table, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def write_long(long, source):
+    """将长表按年份写入数据源分区，同一 (brand, model, price, period) 以新数据为准，只重写涉及的年份
+
+    新数据中销量为空的行不覆盖已有数据，只在存储中还没有该行时按0写入。
+    """
+    years = long['period'].dt.year
+    for year, part in long.groupby(years):
+        path = _partition_path(source, year)
+        # 优先级从低到高：补0的空值行、已有数据、新数据中有销量的行
+        missing = part['sales'].isna()
+        frames = [part[missing].fillna({'sales': 0})]
+        if os.path.exists(path):
+            frames.append(pd.read_parquet(path))
+        frames.append(part[~missing])
+        part = pd.concat(frames, ignore_index=True)
+        part = part.drop_duplicates(subset=KEY_COLUMNS, keep='last')
+        part['sales'] = part['sales'].round().astype('int32')
+        part = part.sort_values(KEY_COLUMNS, ignore_index=True)
+        _write_partition(part, path)
+
+
+def has_store(source):
+    return os.path.isdir(os.path.join(STORE_DIR, f'source={source}'))
+
+
+def build_from_csv(sources=None):
+    """从现有的宽表CSV初始化长格式存储"""
+    for source in sources or SOURCES:
+        csv_name = SOURCES[source]['csv']
+        csv_path = os.path.join(ROOT_DIR, csv_name)
+        if os.path.exists(csv_path):
+            write_long(wide_to_long(pd.read_csv(csv_path, encoding='utf-8-sig'), source), source)
+            print(f"已将 {csv_name} 写入 {source} 数据分区")
+
+
+def write_wide(wide, source):
+    """采集脚本使用：将宽表写入长格式存储，存储尚不存在时先用已有CSV初始化
+
+    宽表中的空值表示没有获取到，不覆盖存储中已有的销量。
+    """
+    if not has_store(source):
+        build_from_csv([source])
+    write_long(wide_to_long(wide, source, fill=False), source)
+
+
+def replace_source(wide, source):
+    """用宽表重建一个数据源的全部分区，宽表中已删除的行和单元格不再保留"""
+    source_dir = os.path.join(STORE_DIR, f'source={source}')
+    if os.path.isdir(source_dir):
+        shutil.rmtree(source_dir)
+    write_long(wide_to_long(wide, source), source)
+
+
+def read_store(source, columns=None, brands=None, start=None, end=None):
+    """读取一个数据源的长表，只读取需要的列，品牌和时间条件下推到分区和行组过滤"""
+    dataset = ds.dataset(STORE_DIR, format='parquet', partitioning='hive')
+    condition = ds.field('source') == source
+    if brands is not None:
+        condition &= ds.field('brand').isin(list(brands))
+    if start is not None:
+        start = pd.Timestamp(start)
+        condition &= (ds.field('year') >= start.year) & (ds.field('period') >= start)
+    if end is not None:
+        end = pd.Timestamp(end)
+        condition &= (ds.field('year') <= end.year) & (ds.field('period') <= end)
+    columns = columns or SCHEMA.names
+    table = dataset.to_table(columns=columns, filter=condition)
+    frame = table.to_pandas(categories=[column for column in CATEGORY_COLUMNS if column in columns])
+    if 'period' in frame.columns:
+        frame['period'] = frame['period'].astype('datetime64[ns]')
+    return frame
+
+
+def load_long(source, columns=None):
+    """优先从长格式存储读取，存储不存在时回退为读取宽表CSV并转换"""
+    if has_store(source):
+        return read_store(source, columns=columns)
+    long = wide_to_long(pd.read_csv(os.path.join(ROOT_DIR, SOURCES[source]['csv'])), source)
+    return long[columns] if columns else long
+
+
+def to_app_frames(monthly, weekly):
+    """将月度和周度长表转换为应用使用的列名和列顺序，品牌、车型、售价为分类类型，销量为int32"""
+    df = monthly.rename(columns={'period': '日期', 'brand': '品牌', 'model': '车型', 'sales': '销量'})
+    df_weekly = weekly.rename(columns={'period': '日期', 'brand': '品牌', 'model': '车型', 'price': '售价', 'sales': '销量'})
+    
+    # 添加周数列
+    df_weekly['周数'] = df_weekly['日期'].dt.isocalendar().week.astype('uint8')
+    
+    return df[['日期', '品牌', '车型', '销量']], df_weekly[['日期', '品牌', '车型', '售价', '周数', '销量']]
+
+
+def load_frames():
+    """返回应用使用的月度和周度长表，列名与页面代码一致"""
+    # 月度数据只读取需要的列
+    monthly = load_long('dongchedi', columns=['period', 'brand', 'model', 'sales'])
+    weekly = load_long('autohome', columns=['period', 'brand', 'model', 'price', 'sales'])
+    return to_app_frames(monthly, weekly)
+
+
+# 文件内容摘要缓存，键为 (路径, 大小, 修改时间)，文件未变化时不重复读取
+_digest_cache = {}
+
+
+def _file_digest(path):
+    stat = os.stat(path)
+    key = (path, stat.st_size, stat.st_mtime_ns)
+    if key not in _digest_cache:
+        with open(path, 'rb') as f:
+            _digest_cache[key] = hashlib.sha1(f.read()).hexdigest()
+    return _digest_cache[key]
+
+
+def data_version():
+    """根据数据文件内容计算数据版本，数据更新后版本随之变化，与文件修改时间无关"""
+    paths = []
+    for source, config in SOURCES.items():
+        # 有长格式存储的数据源以分区文件为准，否则以宽表CSV为准
+        if has_store(source):
+            for dirpath, _, filenames in os.walk(os.path.join(STORE_DIR, f'source={source}')):
+                paths.extend(os.path.join(dirpath, name) for name in filenames if name.endswith('.parquet'))
+        else:
+            paths.append(os.path.join(ROOT_DIR, config['csv']))
+    digest = hashlib.sha1()
+    for path in sorted(paths):
+        if os.path.exists(path):
+            digest.update(f'{os.path.relpath(path, ROOT_DIR)}:{_file_digest(path)}'.encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+if __name__ == '__main__':
+    build_from_csv()
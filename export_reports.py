@@ -0,0 +1,175 @@
+import argparse
+import html
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+import plotly.graph_objects as go
+
+import cube
+import data_store
+import sections
+
+# 报告默认输出到数据目录下，按导出日期分目录
+REPORTS_DIR = os.path.join(data_store.DATA_DIR, 'reports')
+
+# 导出PNG需要 kaleido，未安装时只导出HTML
+try:
+    import kaleido  # noqa: F401
+    HAS_KALEIDO = True
+except ImportError:
+    HAS_KALEIDO = False
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html lang="zh-CN">
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<style>
+body {{ font-family: sans-serif; margin: 1rem 2rem; }}
+h1 {{ color: #1E88E5; }}
+h2 {{ color: #2E7D32; }}
+table {{ border-collapse: collapse; font-size: 14px; }}
+th, td {{ border: 1px solid #ddd; padding: 4px 8px; text-align: right; white-space: nowrap; }}
+.table-wrap {{ overflow-x: auto; max-height: 600px; }}
+</style>
+</head>
+<body>
+<h1>{title}</h1>
+{body}
+</body>
+</html>
+"""
+
+# 工作进程共享的数据，由 _init_worker 在进程启动时设置一次
+_tables = None
+
+
+def _init_worker(tables):
+    global _tables
+    _tables = tables
+
+
+def safe_name(name):
+    """将品牌名转换为可用作文件名的字符串"""
+    return re.sub(r'[\\/:*?"<>|\s]+', '_', str(name)).strip('_') or 'unknown'
+
+
+def table_html(table):
+    return '<div class="table-wrap">' + table.to_html(na_rep='', float_format='{:,.0f}'.format) + '</div>'
+
+
+def brand_report(tables, brand):
+    """构建一个品牌的报告：页面第1部分的车型趋势和月度表，第4部分的周度趋势、占比饼图和周度表"""
+    parts = []
+    figures = {}
+    if brand in tables['model_monthly'].index:
+        fig_models, model_monthly, _ = sections.model_monthly(tables, brand)
+        figures['model_monthly'] = fig_models
+        parts += [('车型月度销量趋势', fig_models), ('车型月度销量', model_monthly)]
+    if brand in tables['model_weekly'].index:
+        fig_weekly, fig_shares, model_pivot, _ = sections.model_weekly(tables, brand)
+        figures['model_weekly'] = fig_weekly
+        figures['model_weekly_share'] = fig_shares
+        parts += [('车型周度销量趋势', fig_weekly), ('车型销量占比', fig_shares), ('车型周度销量明细', model_pivot)]
+    return parts, figures
+
+
+def render_html(brand, parts, include_plotlyjs='cdn'):
+    body = []
+    for title, item in parts:
+        body.append(f'<h2>{html.escape(title)}</h2>')
+        if isinstance(item, go.Figure):
+            # 同一文件内只引入一次plotly.js
+            body.append(item.to_html(full_html=False, include_plotlyjs=include_plotlyjs))
+            include_plotlyjs = False
+        else:
+            body.append(table_html(item))
+    return PAGE_TEMPLATE.format(title=html.escape(f'{brand}销量报告'), body='\n'.join(body))
+
+
+def export_brand(brand, output_dir, png=False, include_plotlyjs='cdn'):
+    """在工作进程中导出一个品牌的报告，返回写出的文件列表"""
+    parts, figures = brand_report(_tables, brand)
+    if not parts:
+        return brand, []
+    name = safe_name(brand)
+    files = []
+    path = os.path.join(output_dir, f'{name}.html')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(render_html(brand, parts, include_plotlyjs))
+    files.append(path)
+    if png:
+        for key, fig in figures.items():
+            path = os.path.join(output_dir, f'{name}_{key}.png')
+            fig.write_image(path, width=1200, height=600)
+            files.append(path)
+    return brand, files
+
+
+def write_index(output_dir, exported):
+    """写出所有品牌报告的索引页"""
+    links = '\n'.join(
+        f'<li><a href="{html.escape(os.path.basename(files[0]))}">{html.escape(brand)}</a></li>'
+        for brand, files in sorted(exported.items()) if files
+    )
+    path = os.path.join(output_dir, 'index.html')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(PAGE_TEMPLATE.format(title='品牌销量报告', body=f'<ul>\n{links}\n</ul>'))
+    return path
+
+
+def main(brands=None, output_dir=None, workers=None, png=False, include_plotlyjs='cdn'):
+    start = time.monotonic()
+    # 在主进程读取一次数据，工作进程启动时继承同一份数据，不各自读取
+    tables = cube.load_tables()
+    all_brands = sorted(set(tables['model_monthly'].index) | set(tables['model_weekly'].index))
+    if brands:
+        unknown = sorted(set(brands) - set(all_brands))
+        if unknown:
+            print(f"以下品牌没有数据，已跳过: {', '.join(unknown)}")
+        brands = [brand for brand in brands if brand in all_brands]
+    else:
+        brands = all_brands
+
+    if png and not HAS_KALEIDO:
+        print("未安装 kaleido，跳过PNG导出（pip install kaleido）")
+        png = False
+
+    output_dir = output_dir or os.path.join(REPORTS_DIR, datetime.now().strftime('%Y%m%d'))
+    os.makedirs(output_dir, exist_ok=True)
+
+    exported = {}
+    failed = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(tables,)) as executor:
+        futures = {
+            executor.submit(export_brand, brand, output_dir, png, include_plotlyjs): brand
+            for brand in brands
+        }
+        for future in as_completed(futures):
+            brand = futures[future]
+            try:
+                _, files = future.result()
+                exported[brand] = files
+            except Exception as e:
+                print(f"导出品牌 {brand} 的报告时出错: {e}")
+                failed.append(brand)
+
+    index_path = write_index(output_dir, exported)
+    print(f"已导出 {len(exported)} 个品牌的报告到 {output_dir}，用时 {time.monotonic() - start:.1f} 秒")
+    print(f"索引页: {index_path}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="批量导出各品牌的车型销量报告（HTML，可选PNG）")
+    parser.add_argument('--brands', nargs='+', help='只导出指定品牌，默认导出全部品牌')
+    parser.add_argument('--output-dir', help='输出目录，默认为 data/reports/<日期>')
+    parser.add_argument('--workers', type=int, help='工作进程数，默认为CPU核数')
+    parser.add_argument('--png', action='store_true', help='同时导出图表PNG（需要安装 kaleido）')
+    parser.add_argument('--inline-js', action='store_true', help='将plotly.js内嵌到HTML中，离线也可查看（文件较大）')
+    args = parser.parse_args()
+    sys.exit(main(args.brands, args.output_dir, args.workers, args.png, True if args.inline_js else 'cdn'))
@@ -0,0 +1,109 @@
+from itertools import product
+
+import numpy as np
+import pandas as pd
+
+from growth import OFFSETS
+
+# 各频率的预测步数：下个月、未来4周
+HORIZONS = {'M': 1, 'W': 4}
+# 季节周期长度，历史长度不足两个周期时不使用季节项
+SEASON_LENGTHS = {'M': 12, 'W': 52}
+
+# 平滑参数的候选值，所有序列和所有候选组合一起计算，每个序列取一步预测误差最小的组合
+ALPHAS = (0.2, 0.4, 0.6, 0.8)
+BETAS = (0.0, 0.1, 0.3)
+GAMMAS = (0.0, 0.2)
+# 趋势阻尼系数，避免趋势在预测期内无限延伸
+PHI = 0.9
+
+
+def smooth(matrix, alpha, beta, gamma, phi=PHI, season=None):
+    """对矩阵的每一行同时做阻尼趋势指数平滑（可带加法季节项）
+
+    按时间逐列递推，每一步是整列的向量运算；alpha、beta、gamma 为每行一个值的数组。
+    每个序列从第一个非零值开始（上市前的0和空值不参与），之后的空值只按趋势外推。
+    返回 (水平, 趋势, 季节项, 一步预测误差平方和)。
+    """
+    rows, periods = matrix.shape
+    season = season or 1
+    level = np.zeros(rows)
+    trend = np.zeros(rows)
+    seasonal = np.zeros((rows, season))
+    sse = np.zeros(rows)
+    positive = np.nan_to_num(matrix) > 0
+    starts = np.where(positive.any(axis=1), positive.argmax(axis=1), periods)
+
+    for t in range(periods):
+        y = matrix[:, t]
+        k = t % season
+        first = starts == t
+        level[first] = y[first]
+        active = (starts < t) & ~np.isnan(y)
+
+        forecast = level + phi * trend + seasonal[:, k]
+        error = np.where(active, y - forecast, 0.0)
+        sse += error ** 2
+
+        new_level = np.where(
+            active,
+            alpha * (np.nan_to_num(y) - seasonal[:, k]) + (1 - alpha) * (level + phi * trend),
+            level + phi * trend
+        )
+        new_trend = np.where(active, beta * (new_level - level) + (1 - beta) * phi * trend, phi * trend)
+        seasonal[:, k] = np.where(active, gamma * (np.nan_to_num(y) - new_level) + (1 - gamma) * seasonal[:, k],
+                                  seasonal[:, k])
+        started = starts < t
+        level = np.where(started, new_level, level)
+        trend = np.where(started, new_trend, trend)
+    return level, trend, seasonal, sse
+
+
+def fit(matrix, season=None):
+    """为每个序列选择平滑参数：把矩阵按候选组合重复堆叠后一次递推，按误差平方和取最优
+
+    返回 (水平, 趋势, 季节项, 季节周期)，前三项每行对应一个序列。
+    """
+    rows, periods = matrix.shape
+    if not season or periods < 2 * season:
+        season = None
+    grid = np.array(list(product(ALPHAS, BETAS, GAMMAS if season else (0.0,))))
+    stacked = np.tile(matrix, (len(grid), 1))
+    alpha, beta, gamma = (np.repeat(grid[:, i], rows) for i in range(3))
+    level, trend, seasonal, sse = smooth(stacked, alpha, beta, gamma, season=season)
+    best = sse.reshape(len(grid), rows).argmin(axis=0) * rows + np.arange(rows)
+    return level[best], trend[best], seasonal[best], season
+
+
+def predict(level, trend, seasonal, periods, horizon, phi=PHI, season=None):
+    """从最后一期外推 horizon 步，销量不小于0"""
+    steps = np.arange(1, horizon + 1)
+    damping = np.cumsum(phi ** steps)
+    result = level[:, None] + trend[:, None] * damping[None, :]
+    if season:
+        result += seasonal[:, (periods - 1 + steps) % season]
+    return np.clip(result, 0, None)
+
+
+def forecast_wide(wide, freq='M', horizon=None):
+    """预测宽表（行为序列、列为日期）中每个序列的未来销量
+
+    返回长表，列为行索引各层、日期、预测销量和步数；步数为0的行是最后一期的实际销量，
+    用于把预测线与实际曲线连接起来。
+    """
+    horizon = horizon or HORIZONS[freq]
+    wide = wide.sort_index(axis=1)
+    matrix = wide.to_numpy(dtype='float64')
+    if not matrix.size:
+        return pd.DataFrame(columns=list(wide.index.names) + ['日期', '预测销量', '步数'])
+    level, trend, seasonal, season = fit(matrix, SEASON_LENGTHS[freq])
+    values = predict(level, trend, seasonal, matrix.shape[1], horizon, season=season)
+
+    # 第0步为最后一期实际销量，之后按日历偏移得到预测日期
+    last = wide.columns[-1]
+    dates = pd.DatetimeIndex([last + OFFSETS[freq]['上期'] * step for step in range(horizon + 1)])
+    values = np.column_stack([np.nan_to_num(matrix[:, -1]), values.round()])
+    result = pd.DataFrame(values, index=wide.index, columns=pd.Index(range(horizon + 1), name='步数'))
+    result = result.stack().rename('预测销量').reset_index()
+    result['日期'] = np.asarray(dates)[result['步数'].to_numpy()]
+    return result[list(wide.index.names) + ['日期', '预测销量', '步数']]
@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+
+# 各频率下的对比周期，按真实日历偏移对齐，缺失的周期不会导致错位
+OFFSETS = {
+    'M': {'去年同期': pd.DateOffset(years=1), '上期': pd.DateOffset(months=1)},
+    'W': {'去年同期': pd.Timedelta(weeks=52), '上期': pd.Timedelta(weeks=1)},
+}
+RATE_COLUMNS = {'去年同期': '同比增长率', '上期': '环比增长率'}
+
+
+def growth_table(frame, keys, freq='M', value='销量'):
+    """按 keys 分组汇总每个日期的销量，并一次性计算所有分组的同比和环比增长率
+
+    freq 为 'M' 时环比为月环比，为 'W' 时为周环比（同比为52周前）。
+    返回以 keys + ['日期'] 为索引的 DataFrame。
+    """
+    series = frame.groupby(keys + ['日期'], observed=True)[value].sum()
+    result = series.to_frame(value)
+    dates = result.index.get_level_values('日期')
+    for base_column, offset in OFFSETS[freq].items():
+        # 用 (分组, 日期 - 偏移) 直接查找对比周期的销量
+        base_dates = dates - offset
+        if keys:
+            lookup = pd.MultiIndex.from_arrays(
+                [result.index.get_level_values(key) for key in keys] + [base_dates]
+            )
+        else:
+            lookup = base_dates
+        base = series.reindex(lookup).to_numpy(dtype='float64')
+        current = result[value].to_numpy(dtype='float64')
+        result[base_column] = base
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rate = (current - base) / base * 100
+        # 对比周期销量为0时增长率没有意义
+        result[RATE_COLUMNS[base_column]] = np.where(base > 0, rate, np.nan)
+    return result
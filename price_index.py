@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+
+# 售价文本形如 "24.88-27.88万" 或 "8.98万"，"暂无报价" 等无法解析的值为空
+PRICE_PATTERN = r'(?P<low>\d+(?:\.\d+)?)(?:\s*[-~～至]\s*(?P<high>\d+(?:\.\d+)?))?\s*万'
+PRICE_COLUMNS = ['最低价', '最高价', '中间价']
+
+# 价格区间（万元），左闭右开
+BAND_EDGES = [0, 10, 15, 20, 25, 30, 40, 50, np.inf]
+BAND_LABELS = ['10万以下', '10-15万', '15-20万', '20-25万', '25-30万', '30-40万', '40-50万', '50万以上']
+
+
+def parse_prices(prices):
+    """将售价文本解析为最低价、最高价和中间价（万元）
+
+    只解析不重复的售价文本，再按原顺序展开，分类类型的列只解析各个分类。
+    """
+    prices = pd.Series(prices)
+    if isinstance(prices.dtype, pd.CategoricalDtype):
+        values = prices.cat.categories.to_series(index=range(len(prices.cat.categories)))
+        codes = prices.cat.codes.to_numpy()
+    else:
+        codes, uniques = pd.factorize(prices)
+        values = pd.Series(uniques)
+    parsed = values.astype(str).str.extract(PRICE_PATTERN)
+    low = parsed['low'].astype(float)
+    high = parsed['high'].astype(float).fillna(low)
+    table = np.column_stack([low, high, (low + high) / 2])
+    # 缺失值（编码为-1）对应追加的一行空值
+    table = np.vstack([table, np.full((1, 3), np.nan)])
+    return pd.DataFrame(table[codes], columns=PRICE_COLUMNS, index=prices.index)
+
+
+def price_band(mid):
+    """按中间价划分价格区间"""
+    return pd.cut(mid, BAND_EDGES, labels=BAND_LABELS, right=False)
+
+
+def add_price_columns(frame, column='售价'):
+    """添加数值价格列和价格区间列"""
+    frame = frame.copy()
+    frame[PRICE_COLUMNS] = parse_prices(frame[column])
+    frame['价格区间'] = price_band(frame['中间价'])
+    return frame
+
+
+class PriceIndex:
+    """按中间价排序的索引，价格范围筛选用二分查找取出连续的一段行"""
+
+    def __init__(self, frame, price_column='中间价'):
+        frame = frame[frame[price_column].notna()]
+        self.frame = frame.sort_values(price_column, kind='stable')
+        self.prices = self.frame[price_column].to_numpy()
+
+    def between(self, low=None, high=None):
+        """中间价在 [low, high] 范围内的行"""
+        start = 0 if low is None else np.searchsorted(self.prices, low, side='left')
+        end = len(self.prices) if high is None else np.searchsorted(self.prices, high, side='right')
+        return self.frame.iloc[start:end]
+
+    def bounds(self):
+        if not len(self.prices):
+            return None, None
+        return float(self.prices[0]), float(self.prices[-1])
@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+
+# 各频率的日历步长，周期列之间缺失的周期按步长补齐后再计算
+STEPS = {'M': 'MS', 'W': '7D'}
+
+# 页面可选的指标：(计算方法, 窗口期数)
+METRICS = {
+    'M': {'3个月移动平均': ('moving_average', 3), '年初至今累计': ('year_to_date', None), '上市以来累计': ('launch_to_date', None)},
+    'W': {'4周移动平均': ('moving_average', 4), '年初至今累计': ('year_to_date', None), '上市以来累计': ('launch_to_date', None)},
+}
+
+
+class RollingAnalytics:
+    """每个序列的销量前缀和，滑动平均、年初至今和上市以来累计的每个点都是两个前缀和相减
+
+    输入为 cube 中的 车型×日期 宽表。缺失的周期列（采集失败）不计入滑动平均的期数，
+    宽表中的空值（当期没有该车型）按0计算。
+    """
+
+    def __init__(self, wide, freq='M'):
+        wide = wide.sort_index(axis=1)
+        self.index = wide.index
+        self.observed_dates = wide.columns
+        dates = pd.date_range(wide.columns.min(), wide.columns.max(), freq=STEPS[freq]) if len(wide.columns) else wide.columns
+        self.dates = dates.union(wide.columns)
+        matrix = wide.reindex(columns=self.dates).to_numpy(dtype='float64')
+        observed = self.dates.isin(wide.columns)
+
+        # 前缀和多一列0，第t期及之前的和为 prefix[:, t + 1]
+        self.prefix = np.zeros((matrix.shape[0], matrix.shape[1] + 1))
+        np.cumsum(np.where(observed, np.nan_to_num(matrix), 0.0), axis=1, out=self.prefix[:, 1:])
+        self.count_prefix = np.concatenate([[0], np.cumsum(observed)])
+
+        # 每期所在年份第一期的位置，用于年初至今累计
+        years = self.dates.year
+        self.year_starts = np.searchsorted(years, years, side='left')
+        # 每个序列第一次有销量的位置，没有销量的序列为期数
+        positive = np.nan_to_num(matrix) > 0
+        self.launches = np.where(positive.any(axis=1), positive.argmax(axis=1), len(self.dates))
+
+    def _rows(self, brand=None):
+        if brand is None:
+            return slice(None)
+        return self.index.get_locs([brand])
+
+    def window_sum(self, window, rows=slice(None)):
+        """以每期为终点、长度为 window 期的销量和及其中有数据的期数"""
+        ends = np.arange(1, len(self.dates) + 1)
+        starts = np.maximum(ends - window, 0)
+        sums = self.prefix[rows][:, ends] - self.prefix[rows][:, starts]
+        counts = self.count_prefix[ends] - self.count_prefix[starts]
+        return sums, counts
+
+    def moving_average(self, window, rows=slice(None)):
+        """window 期滑动平均，窗口不满时为空"""
+        sums, counts = self.window_sum(window, rows)
+        full = np.arange(len(self.dates)) >= window - 1
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(full & (counts > 0), sums / counts, np.nan)
+
+    def year_to_date(self, rows=slice(None)):
+        """当年第一期到每期的累计销量"""
+        ends = np.arange(1, len(self.dates) + 1)
+        return self.prefix[rows][:, ends] - self.prefix[rows][:, self.year_starts]
+
+    def launch_to_date(self, rows=slice(None)):
+        """从第一次有销量起到每期的累计销量，上市前为空"""
+        prefix = self.prefix[rows]
+        launches = self.launches[rows]
+        totals = prefix[:, 1:] - prefix[np.arange(len(prefix)), launches][:, None]
+        return np.where(np.arange(len(self.dates)) >= launches[:, None], totals, np.nan)
+
+    def metric(self, name, freq='M', brand=None):
+        """计算一个品牌（或全部序列）的指标，返回与输入相同形式的宽表，只保留原有的周期列"""
+        method, window = METRICS[freq][name]
+        rows = self._rows(brand)
+        values = getattr(self, method)(window, rows) if window else getattr(self, method)(rows)
+        index = self.index[rows]
+        if brand is not None:
+            index = index.droplevel(0)
+        result = pd.DataFrame(values, index=index, columns=self.dates)
+        return result.loc[:, self.observed_dates]
@@ -0,0 +1,99 @@
+import argparse
+import glob
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from mock_server import load_recorded, start_server
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 各采集脚本及基准测试时使用的参数：全量获取、不使用缓存
+COLLECTORS = {
+    'autohome': ['汽车销售数据采集_汽车之家.py', '--full', '--no-cache'],
+    'dongchedi': ['汽车销量数据采集_懂车帝.py', '--full', '--no-cache'],
+}
+
+
+def run_collector(name, server, workdir, extra_args=()):
+    """在临时目录中运行一个采集脚本，数据和指标都写入临时目录，返回结果统计"""
+    script, *args = COLLECTORS[name]
+    env = dict(os.environ, SALES_DATA_DIR=os.path.join(workdir, 'data'), TQDM_DISABLE='1', PYTHONIOENCODING='utf-8')
+    requests_before = server.stats['requests']
+    start = time.monotonic()
+    result = subprocess.run(
+        [sys.executable, os.path.join(SCRIPT_DIR, script), *args, '--base-url', server.base_url, *extra_args],
+        cwd=workdir,
+        env=env,
+        capture_output=True,
+        text=True,
+        encoding='utf-8',
+        errors='replace'
+    )
+    elapsed = time.monotonic() - start
+    served = server.stats['requests'] - requests_before
+
+    stats = {
+        'collector': name,
+        'returncode': result.returncode,
+        'elapsed_seconds': round(elapsed, 3),
+        'server_requests': served,
+        'requests_per_second': round(served / elapsed, 2) if elapsed > 0 else None,
+    }
+    # 附上采集脚本自己记录的指标
+    reports = sorted(glob.glob(os.path.join(workdir, 'data', 'metrics', f'collection_{name}_*.json')))
+    if reports:
+        with open(reports[-1], encoding='utf-8') as f:
+            report = json.load(f)
+        for key in ('requests', 'failures', 'retries', 'rows_extracted', 'sleep_seconds', 'latency_p50', 'latency_p90'):
+            stats[key] = report.get(key)
+    if result.returncode != 0:
+        stats['stderr'] = result.stderr[-2000:]
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="使用本地模拟服务对采集脚本做基准测试")
+    parser.add_argument('--collectors', nargs='+', choices=list(COLLECTORS), default=list(COLLECTORS))
+    parser.add_argument('--latency', type=float, default=0.02, help='模拟服务每个请求的延迟（秒）')
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--rate-429', type=float, default=0.0)
+    parser.add_argument('--series', type=int, default=30, help='每个品牌的车系数量')
+    parser.add_argument('--fixtures', help='录制响应所在的HTTP缓存目录')
+    parser.add_argument('--autohome-args', default='--rate 0 --concurrency 8 --per-host 8', help='传给汽车之家采集脚本的额外参数')
+    parser.add_argument('--output', help='将结果写入JSON文件')
+    args = parser.parse_args()
+
+    server = start_server(
+        latency=args.latency, jitter=args.jitter, error_rate=args.error_rate, rate_429=args.rate_429,
+        series_per_brand=args.series, recorded=load_recorded(args.fixtures) if args.fixtures else None
+    )
+    print(f"模拟服务: {server.base_url}")
+
+    results = []
+    try:
+        for name in args.collectors:
+            extra_args = args.autohome_args.split() if name == 'autohome' else []
+            with tempfile.TemporaryDirectory() as workdir:
+                stats = run_collector(name, server, workdir, extra_args)
+            results.append(stats)
+            print(f"{name}: 用时 {stats['elapsed_seconds']} 秒, 请求 {stats['server_requests']} 次, "
+                  f"{stats['requests_per_second']} 请求/秒, 退出码 {stats['returncode']}")
+            if 'stderr' in stats:
+                print(stats['stderr'])
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'server_stats': server.stats, 'results': results}, f, ensure_ascii=False, indent=2)
+    return 0 if all(stats['returncode'] == 0 for stats in results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
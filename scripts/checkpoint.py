@@ -0,0 +1,73 @@
+import hashlib
+import json
+import os
+
+from collection_metrics import DATA_DIR
+
+# 采集检查点目录，每个数据源一个子目录
+CHECKPOINT_DIR = os.path.join(DATA_DIR, 'checkpoints')
+
+
+def atomic_write_text(path, text, encoding='utf-8'):
+    """先写同目录下的临时文件再重命名，文件不会处于写了一半的状态"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = os.path.join(directory, f'.{os.path.basename(path)}.{os.getpid()}.tmp')
+    try:
+        with open(tmp_path, 'w', encoding=encoding, newline='') as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def write_csv_atomic(frame, path):
+    """原子地保存CSV，采集中断时原有文件保持不变"""
+    atomic_write_text(path, frame.to_csv(index=False), encoding='utf-8-sig')
+
+
+class CheckpointStore:
+    """按 (品牌, 周期) 保存已完成的采集结果，中断后可从检查点继续
+
+    每个单元一个JSON文件，写入是原子的；整次采集成功保存后清空。
+    """
+
+    def __init__(self, source, directory=None):
+        self.directory = os.path.join(directory or CHECKPOINT_DIR, source)
+
+    def _path(self, brand, period):
+        digest = hashlib.md5(f'{brand}|{period}'.encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.directory, f'{digest}.json')
+
+    def save(self, brand, period, rows):
+        """保存一个已完成单元的数据行（可以为空列表）"""
+        atomic_write_text(
+            self._path(brand, period),
+            json.dumps({'brand': brand, 'period': period, 'rows': rows}, ensure_ascii=False)
+        )
+
+    def load(self):
+        """读取所有已完成的单元，返回 {(品牌, 周期): 数据行}，损坏的文件跳过"""
+        completed = {}
+        if not os.path.isdir(self.directory):
+            return completed
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.directory, name), encoding='utf-8') as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                continue
+            completed[(entry['brand'], entry['period'])] = entry['rows']
+        return completed
+
+    def clear(self):
+        if not os.path.isdir(self.directory):
+            return
+        for name in os.listdir(self.directory):
+            if name.endswith('.json') or name.endswith('.tmp'):
+                os.remove(os.path.join(self.directory, name))
@@ -0,0 +1,137 @@
+import csv
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from datetime import datetime
+
+# 运行报告保存在数据目录下，便于长期跟踪采集性能
+DATA_DIR = os.getenv('SALES_DATA_DIR', os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data'))
+METRICS_DIR = os.path.join(DATA_DIR, 'metrics')
+
+# 请求延迟直方图的桶上界（秒），最后一个桶收集所有更慢的请求
+LATENCY_BUCKETS = [0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0]
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))
+    return round(sorted_values[index], 4)
+
+
+class CollectionMetrics:
+    """线程安全的采集指标：请求延迟、重试、接收字节数、每次请求提取的行数和等待时间"""
+
+    def __init__(self, source):
+        self.source = source
+        self.started_at = datetime.now()
+        self._start = time.monotonic()
+        self._lock = threading.Lock()
+        self.latencies = []
+        self.rows_per_request = []
+        self.counters = {
+            'requests': 0,
+            'failures': 0,
+            'retries': 0,
+            'cache_hits': 0,
+            'bytes_received': 0,
+            'empty_payloads': 0,
+            'sleep_seconds': 0.0,
+        }
+
+    def _add(self, name, value=1):
+        with self._lock:
+            self.counters[name] += value
+
+    def record_request(self, latency, nbytes=0, ok=True):
+        """记录一次HTTP请求，latency 为最后一次尝试的延迟"""
+        with self._lock:
+            self.latencies.append(latency)
+            self.counters['requests'] += 1
+            self.counters['bytes_received'] += nbytes
+            if not ok:
+                self.counters['failures'] += 1
+
+    def record_retry(self, latency, sleep=0.0):
+        """记录一次传输层重试：失败尝试的延迟计入延迟分布，退避等待计入 sleep_seconds"""
+        with self._lock:
+            self.latencies.append(latency)
+            self.counters['retries'] += 1
+            self.counters['sleep_seconds'] += sleep
+
+    def record_cache_hit(self):
+        self._add('cache_hits')
+
+    def record_sleep(self, seconds):
+        self._add('sleep_seconds', seconds)
+
+    def record_rows(self, rows):
+        """记录一次请求提取出的数据行数，0行视为空响应"""
+        with self._lock:
+            self.rows_per_request.append(rows)
+            if rows == 0:
+                self.counters['empty_payloads'] += 1
+
+    def summary(self):
+        with self._lock:
+            latencies = sorted(self.latencies)
+            rows = list(self.rows_per_request)
+            counters = dict(self.counters)
+        elapsed = time.monotonic() - self._start
+        histogram = [0] * (len(LATENCY_BUCKETS) + 1)
+        for latency in latencies:
+            histogram[bisect_left(LATENCY_BUCKETS, latency)] += 1
+        labels = [f'<={bound}s' for bound in LATENCY_BUCKETS] + [f'>{LATENCY_BUCKETS[-1]}s']
+        return {
+            'source': self.source,
+            'started_at': self.started_at.isoformat(timespec='seconds'),
+            'elapsed_seconds': round(elapsed, 3),
+            **counters,
+            'sleep_seconds': round(counters['sleep_seconds'], 3),
+            'rows_extracted': sum(rows),
+            'rows_per_request_avg': round(sum(rows) / len(rows), 2) if rows else None,
+            'requests_per_second': round(counters['requests'] / elapsed, 3) if elapsed > 0 else None,
+            'latency_p50': _percentile(latencies, 0.5),
+            'latency_p90': _percentile(latencies, 0.9),
+            'latency_p99': _percentile(latencies, 0.99),
+            'latency_max': round(latencies[-1], 4) if latencies else None,
+            'latency_histogram': dict(zip(labels, histogram)),
+        }
+
+    def write_report(self, directory=METRICS_DIR):
+        return write_report(f'collection_{self.source}', self.summary(), directory)
+
+
+def write_report(kind, summary, directory=METRICS_DIR):
+    """将一次运行的指标写为JSON报告，并把标量字段追加到同类报告的CSV汇总中"""
+    os.makedirs(directory, exist_ok=True)
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    json_path = os.path.join(directory, f'{kind}_{timestamp}.json')
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+
+    row = {key: value for key, value in summary.items() if not isinstance(value, (dict, list))}
+    csv_path = os.path.join(directory, f'{kind}_runs.csv')
+    fieldnames = _csv_header(csv_path)
+    if fieldnames is not None and not set(row) <= set(fieldnames):
+        # 出现已有表头中没有的字段时，旧文件改名保留，新文件使用新的表头，避免列错位
+        os.replace(csv_path, os.path.join(directory, f'{kind}_runs_{timestamp}.csv'))
+        fieldnames = None
+    write_header = fieldnames is None
+    with open(csv_path, 'a', newline='', encoding='utf-8-sig') as f:
+        # 按已有表头的列顺序写入，本次没有的字段留空
+        writer = csv.DictWriter(f, fieldnames=fieldnames or list(row), restval='')
+        if write_header:
+            writer.writeheader()
+        writer.writerow(row)
+    return json_path
+
+
+def _csv_header(csv_path):
+    """已有汇总CSV的表头，文件不存在或为空时返回None"""
+    if not os.path.exists(csv_path):
+        return None
+    with open(csv_path, newline='', encoding='utf-8-sig') as f:
+        return next(csv.reader(f), None)
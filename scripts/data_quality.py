@@ -0,0 +1,172 @@
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from collection_metrics import DATA_DIR
+from incremental import FIXED_COLUMNS
+
+# 被隔离的数据写入该目录，便于人工核对
+QUARANTINE_DIR = os.path.join(DATA_DIR, 'quarantine')
+
+# block: 发现错误时拒绝本次数据；quarantine: 隔离有问题的行和单元格后继续；warn: 只报告
+MODES = ('block', 'quarantine', 'warn')
+
+# 各数据源的周期频率，用于检查缺失的周期列
+FREQUENCIES = {
+    'dongchedi': ('%Y%m', 'MS'),
+    'autohome': ('%Y-%m-%d', '7D'),
+}
+
+# 连续相同的非零销量达到该长度视为回填产生的数据
+MIN_CONSTANT_RUN = 6
+# 相邻两期销量（均非零）相差超过该倍数视为异常跳变
+JUMP_RATIO = 20
+# 相邻两期中较大的销量低于该值时不判断跳变，避免小销量车型误报
+JUMP_FLOOR = 500
+
+
+def period_matrix(wide):
+    """将宽表拆分为键列和 车型×周期 的浮点矩阵"""
+    periods = [column for column in wide.columns if column not in FIXED_COLUMNS]
+    try:
+        matrix = wide[periods].to_numpy(dtype='float64')
+    except (TypeError, ValueError):
+        # 含有非数值文本时逐列转换，无法解析的值为空
+        matrix = wide[periods].apply(pd.to_numeric, errors='coerce').to_numpy(dtype='float64')
+    return wide[FIXED_COLUMNS], [str(period) for period in periods], matrix
+
+
+def missing_periods(periods, source):
+    """周期列之间缺失的周期"""
+    if source not in FREQUENCIES or not periods:
+        return []
+    period_format, freq = FREQUENCIES[source]
+    dates = pd.to_datetime(pd.Index(periods), format=period_format, errors='coerce')
+    dates = dates[dates.notna()]
+    if dates.empty:
+        return []
+    expected = pd.date_range(dates.min(), dates.max(), freq=freq)
+    return list(expected.difference(dates).strftime(period_format))
+
+
+def constant_runs(matrix, min_run=MIN_CONSTANT_RUN):
+    """连续 min_run 期以上相同非零值的单元格
+
+    每行开头和值变化处开始一段，对展平后的段起点累加得到段编号，
+    bincount 得到每段长度，一次计算所有车型。
+    """
+    starts = np.ones(matrix.shape, dtype=bool)
+    starts[:, 1:] = matrix[:, 1:] != matrix[:, :-1]
+    run_ids = np.cumsum(starts.ravel()) - 1
+    lengths = np.bincount(run_ids)[run_ids].reshape(matrix.shape)
+    return (lengths >= min_run) & (matrix > 0)
+
+
+def jumps(matrix, ratio=JUMP_RATIO, floor=JUMP_FLOOR):
+    """与上一期相比销量变化超过 ratio 倍的单元格，新上市和停售（一侧为0）不算跳变"""
+    mask = np.zeros(matrix.shape, dtype=bool)
+    previous, current = matrix[:, :-1], matrix[:, 1:]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        high = np.fmax(previous, current)
+        low = np.fmin(previous, current)
+        mask[:, 1:] = (low > 0) & (high >= floor) & (high >= low * ratio)
+    return mask
+
+
+class QualityReport:
+    """一个数据源的检查结果，错误可以阻止或隔离，警告只报告"""
+
+    def __init__(self, source, keys, periods, matrix):
+        self.source = source
+        self.keys = keys
+        self.periods = periods
+        self.matrix = matrix
+        self.duplicates = keys.duplicated(keep='first').to_numpy()
+        self.negative = matrix < 0
+        self.constant = constant_runs(matrix)
+        self.jumps = jumps(matrix)
+        self.missing_periods = missing_periods(periods, source)
+        self.seconds = 0.0
+
+    @property
+    def bad_cells(self):
+        return self.negative | self.constant
+
+    @property
+    def has_errors(self):
+        return bool(self.duplicates.any() or self.bad_cells.any())
+
+    def summary(self):
+        return {
+            'source': self.source,
+            'rows': int(self.matrix.shape[0]),
+            'periods': int(self.matrix.shape[1]),
+            'duplicate_keys': int(self.duplicates.sum()),
+            'negative_cells': int(self.negative.sum()),
+            'constant_run_cells': int(self.constant.sum()),
+            'constant_run_rows': int(self.constant.any(axis=1).sum()),
+            'jump_cells': int(self.jumps.sum()),
+            'missing_periods': self.missing_periods,
+            'check_ms': round(self.seconds * 1000, 3),
+        }
+
+    def describe(self, limit=5):
+        """有问题的车型，用于日志输出"""
+        lines = []
+        for name, mask in (('重复键', self.duplicates[:, None]), ('负数销量', self.negative),
+                           ('连续相同值', self.constant), ('异常跳变', self.jumps)):
+            rows = np.flatnonzero(mask.any(axis=1))
+            if len(rows):
+                examples = '、'.join(self.keys.iloc[rows[:limit]]['车型'].astype(str))
+                lines.append(f"{name}: {len(rows)} 个车型，如 {examples}")
+        if self.missing_periods:
+            lines.append(f"缺失周期: {', '.join(self.missing_periods)}")
+        return lines
+
+
+def check(wide, source):
+    """对一个宽表做一次向量化检查"""
+    start = time.perf_counter()
+    keys, periods, matrix = period_matrix(wide)
+    report = QualityReport(source, keys, periods, matrix)
+    report.seconds = time.perf_counter() - start
+    return report
+
+
+def _cells(report, mask, problem):
+    """取出矩阵中被标记的单元格，转换为长表"""
+    rows, cols = np.nonzero(mask)
+    cells = report.keys.iloc[rows].reset_index(drop=True)
+    cells['周期'] = np.asarray(report.periods, dtype=object)[cols]
+    cells['销量'] = report.matrix[rows, cols]
+    cells['问题'] = problem
+    return cells
+
+
+def quarantine(wide, report, directory=QUARANTINE_DIR):
+    """移除重复键的后续行，并将负数和连续相同值的单元格置空
+
+    被移除的数据以长表形式写入隔离目录，返回 (清理后的宽表, 隔离文件路径)。
+    """
+    duplicate_rows = wide[report.duplicates].melt(id_vars=FIXED_COLUMNS, var_name='周期', value_name='销量')
+    duplicate_rows['问题'] = '重复键'
+    removed = pd.concat([
+        duplicate_rows,
+        _cells(report, report.negative, '负数销量'),
+        _cells(report, report.constant & ~report.negative, '连续相同值'),
+    ], ignore_index=True)
+
+    cleaned = wide.copy()
+    matrix = report.matrix.copy()
+    matrix[report.bad_cells] = np.nan
+    cleaned[[column for column in wide.columns if column not in FIXED_COLUMNS]] = matrix
+    cleaned = cleaned[~report.duplicates].reset_index(drop=True)
+
+    os.makedirs(directory, exist_ok=True)
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    path = os.path.join(directory, f'{report.source}_{timestamp}.csv')
+    removed.to_csv(path, index=False, encoding='utf-8-sig')
+    return cleaned, path
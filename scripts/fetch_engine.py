@@ -0,0 +1,82 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
+
+from tqdm import tqdm
+
+
+class TokenBucket:
+    """令牌桶限速器：rate为每秒补充的令牌数，capacity为允许的突发请求数"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity) if capacity else max(1.0, self.rate)
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1.0):
+        """阻塞直到取得令牌，返回本次等待的秒数"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+
+class FetchEngine:
+    """基于线程池的并发抓取引擎，所有请求共享一个令牌桶，并限制每个主机的并发数"""
+
+    def __init__(self, rate=2.0, burst=None, max_workers=8, per_host=4, metrics=None):
+        # rate <= 0 表示不限速
+        self.bucket = TokenBucket(rate, burst) if rate and rate > 0 else None
+        self.max_workers = max(1, int(max_workers))
+        self.per_host = max(1, int(per_host))
+        self.metrics = metrics
+        self._host_slots = {}
+        self._lock = threading.Lock()
+
+    def _host_slot(self, host):
+        with self._lock:
+            if host not in self._host_slots:
+                self._host_slots[host] = threading.BoundedSemaphore(self.per_host)
+            return self._host_slots[host]
+
+    def call(self, url, fn, *args, **kwargs):
+        """在主机并发上限和全局限速下执行一次请求"""
+        with self._host_slot(urlparse(url).netloc):
+            if self.bucket is not None:
+                waited = self.bucket.acquire()
+                if self.metrics is not None and waited:
+                    self.metrics.record_sleep(waited)
+            return fn(*args, **kwargs)
+
+    def map(self, url, fn, tasks, desc=None, lookup=None):
+        """并发执行 fn(*task)，按完成顺序产出 (task, result, error)
+
+        lookup(*task) 返回非None时直接使用该结果（如缓存命中），不占用限速令牌
+        """
+        pending = []
+        for task in tasks:
+            result = lookup(*task) if lookup is not None else None
+            if result is not None:
+                yield task, result, None
+            else:
+                pending.append(task)
+        tasks = pending
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = {pool.submit(self.call, url, fn, *task): task for task in tasks}
+            for future in tqdm(as_completed(futures), total=len(futures), desc=desc):
+                task = futures[future]
+                try:
+                    yield task, future.result(), None
+                except Exception as e:
+                    yield task, None, e
@@ -0,0 +1,62 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+# 默认缓存目录位于项目根目录下
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'cache', 'http')
+
+# 已结束周期的数据基本不再变化，缓存较长时间；当前周期的数据可能被修正，只缓存较短时间
+CLOSED_PERIOD_TTL = 30 * 24 * 3600
+OPEN_PERIOD_TTL = 6 * 3600
+
+
+def period_ttl(period_end, settle_days=7):
+    """根据周期结束时间选择缓存有效期，结束超过settle_days天的周期视为已结束"""
+    if datetime.now() - period_end > timedelta(days=settle_days):
+        return CLOSED_PERIOD_TTL
+    return OPEN_PERIOD_TTL
+
+
+class ResponseCache:
+    """以URL和请求参数的哈希为键的磁盘响应缓存，offline模式下只从缓存读取"""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, offline=False):
+        self.cache_dir = cache_dir
+        self.offline = offline
+
+    @staticmethod
+    def key(url, params=None):
+        """根据URL和排序后的参数计算缓存键"""
+        payload = json.dumps(
+            {'url': url, 'params': sorted((str(k), str(v)) for k, v in (params or {}).items())},
+            ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + '.json')
+
+    def get(self, url, params=None, ttl=None):
+        """返回缓存的响应内容，未命中或已过期返回None；offline模式下忽略过期时间"""
+        path = self._path(self.key(url, params))
+        try:
+            with open(path, encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not self.offline and ttl is not None and time.time() - entry['fetched_at'] > ttl:
+            return None
+        return entry['body']
+
+    def put(self, url, params, body):
+        """写入缓存，先写临时文件再重命名，避免留下不完整的缓存文件"""
+        path = self._path(self.key(url, params))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        entry = {'url': url, 'params': params or {}, 'fetched_at': time.time(), 'body': body}
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
@@ -0,0 +1,99 @@
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# 连接超时和读取超时（秒）
+DEFAULT_TIMEOUT = (5, 30)
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept-Encoding': 'gzip, deflate',
+    'Connection': 'keep-alive',
+}
+
+_session = None
+_lock = threading.Lock()
+# 当前线程中正在进行的一次尝试的开始时间，传输层重试时在退避等待之后重新计时
+_attempt = threading.local()
+
+
+def attempt_seconds():
+    """当前线程最后一次尝试开始至今的秒数，不含之前失败的尝试和退避等待"""
+    return time.monotonic() - getattr(_attempt, 'start', time.monotonic())
+
+
+class RecordingRetry(Retry):
+    """把传输层的重试记录到采集指标的 Retry
+
+    urllib3 只在真正重试之前调用 sleep，此时记录失败尝试的延迟和退避（或 Retry-After）等待的秒数。
+    """
+
+    def __init__(self, *args, metrics=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = metrics
+
+    def new(self, **kwargs):
+        retry = super().new(**kwargs)
+        retry.metrics = self.metrics
+        return retry
+
+    def sleep(self, response=None):
+        latency = attempt_seconds()
+        start = time.monotonic()
+        super().sleep(response)
+        slept = time.monotonic() - start
+        if self.metrics is not None:
+            self.metrics.record_retry(latency, slept)
+        # 下一次尝试从等待结束后开始计时
+        _attempt.start = time.monotonic()
+
+
+def create_session(pool_size=8, retries=3, backoff=0.5, metrics=None):
+    """创建带连接池和传输层重试的会话
+
+    失败的请求按 backoff * 2^n 秒指数退避后重试，429和5xx响应同样重试，并遵守 Retry-After。
+    给出 metrics 时每次重试的延迟和等待时间计入采集指标。
+    """
+    retry = RecordingRetry(
+        metrics=metrics,
+        total=retries,
+        backoff_factor=backoff,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset({'GET'}),
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry, pool_block=True)
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update(DEFAULT_HEADERS)
+    return session
+
+
+def configure(pool_size=8, retries=3, backoff=0.5, metrics=None):
+    """按给定参数重建共享会话"""
+    global _session
+    with _lock:
+        if _session is not None:
+            _session.close()
+        _session = create_session(pool_size, retries, backoff, metrics)
+    return _session
+
+
+def get_session():
+    """返回进程内共享的会话，尚未配置时使用默认参数创建"""
+    global _session
+    with _lock:
+        if _session is None:
+            _session = create_session()
+        return _session
+
+
+def get(url, **kwargs):
+    """使用共享会话发送GET请求，请求结束后 attempt_seconds() 为最后一次尝试的延迟"""
+    _attempt.start = time.monotonic()
+    return get_session().get(url, **kwargs)
@@ -0,0 +1,35 @@
+import os
+
+import pandas as pd
+
+# 宽表中的固定列，其余列均为周期列
+FIXED_COLUMNS = ['汽车品牌', '车型', '售价']
+
+
+def find_existing_csv(filename):
+    """按当前目录、项目根目录的顺序查找已有的数据文件，找不到返回None"""
+    root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    for path in (filename, os.path.join(root_dir, filename)):
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def existing_periods(csv_path):
+    """只读取表头，返回已有文件中的周期列"""
+    if not csv_path:
+        return []
+    try:
+        columns = pd.read_csv(csv_path, nrows=0, encoding='utf-8-sig').columns
+    except Exception as e:
+        print(f"读取已有数据文件 {csv_path} 的表头时出错: {str(e)}")
+        return []
+    return [str(col) for col in columns if col not in FIXED_COLUMNS]
+
+
+def select_periods(all_periods, existing, refetch=0):
+    """返回需要抓取的周期：已有文件中缺失的周期，加上最近refetch个已有周期用于修正数据"""
+    existing = set(existing)
+    present = [p for p in all_periods if p in existing]
+    refetch_set = set(present[-refetch:]) if refetch > 0 else set()
+    return [p for p in all_periods if p not in existing or p in refetch_set]
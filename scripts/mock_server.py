@@ -0,0 +1,190 @@
+import argparse
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlparse
+
+# 与采集脚本一致的接口路径
+AUTOHOME_PATH = '/carext/recrank/all/getrecranklistpageresult2'
+DONGCHEDI_PATH = '/motor/pc/car/rank_data'
+
+
+def _seed(*parts):
+    """根据请求参数生成稳定的随机种子，同一请求总是返回相同的数据"""
+    return int(hashlib.md5('|'.join(map(str, parts)).encode('utf-8')).hexdigest()[:8], 16)
+
+
+def synthetic_autohome(params, series_per_brand):
+    """生成汽车之家排行榜接口格式的数据：result.list，并按 pageindex/pagesize 分页"""
+    brand_id = params.get('brandid', '0')
+    pageindex = int(params.get('pageindex', 1))
+    pagesize = int(params.get('pagesize', 50))
+    rng = random.Random(_seed('autohome', brand_id, params.get('week')))
+    start = (pageindex - 1) * pagesize
+    items = []
+    for i in range(start, min(series_per_brand, start + pagesize)):
+        low = 5 + _seed(brand_id, i) % 40
+        items.append({
+            'seriesname': f'车系{brand_id}-{i}',
+            'priceinfo': f'{low:.2f}-{low + 5:.2f}万',
+            'salecount': rng.randint(0, 5000),
+        })
+    return {
+        'returncode': 0,
+        'result': {
+            'pagecount': -(-series_per_brand // pagesize),
+            'rowcount': series_per_brand,
+            'list': items,
+        },
+    }
+
+
+def synthetic_dongchedi(params, series_per_brand):
+    """生成懂车帝排行榜接口格式的数据：data.list"""
+    brand_id = params.get('brand_id', '0')
+    rng = random.Random(_seed('dongchedi', brand_id, params.get('month')))
+    items = []
+    for i in range(series_per_brand):
+        low = 5 + _seed(brand_id, i) % 40
+        items.append({
+            'brand_name': f'品牌{brand_id}',
+            'series_name': f'车系{brand_id}-{i}',
+            'price': f'{low:.2f}-{low + 5:.2f}万',
+            'count': rng.randint(0, 20000),
+        })
+    return {'status': 0, 'data': {'list': items}}
+
+
+def load_recorded(cache_dir):
+    """读取HTTP响应缓存目录中录制的响应，按 (路径, 排序后的参数) 建立索引"""
+    recorded = {}
+    for dirpath, _, filenames in os.walk(cache_dir):
+        for name in filenames:
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(dirpath, name), encoding='utf-8') as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                continue
+            params = {str(k): str(v) for k, v in entry.get('params', {}).items()}
+            recorded[(urlparse(entry['url']).path, tuple(sorted(params.items())))] = entry['body']
+    return recorded
+
+
+class MockRankServer(ThreadingHTTPServer):
+    """模拟两个排行榜接口的本地服务，可配置延迟、错误率和429限流响应"""
+
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.0, jitter=0.0, error_rate=0.0, rate_429=0.0,
+                 retry_after=0, series_per_brand=30, recorded=None, seed=0):
+        super().__init__(address, MockRankHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_429 = rate_429
+        self.retry_after = retry_after
+        self.series_per_brand = series_per_brand
+        self.recorded = recorded or {}
+        self.random = random.Random(seed)
+        self.stats = {'requests': 0, 'ok': 0, 'errors': 0, 'throttled': 0, 'not_found': 0}
+        self.lock = threading.Lock()
+
+    def count(self, name):
+        with self.lock:
+            self.stats['requests'] += 1
+            self.stats[name] += 1
+
+    def draw(self):
+        with self.lock:
+            return self.random.random(), self.random.uniform(-self.jitter, self.jitter)
+
+    @property
+    def base_url(self):
+        return f'http://{self.server_address[0]}:{self.server_address[1]}'
+
+
+class MockRankHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # 响应头和响应体分两次写出，关闭Nagle算法避免额外的延迟确认等待
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        server = self.server
+        parsed = urlparse(self.path)
+        params = dict(parse_qsl(parsed.query))
+
+        roll, jitter = server.draw()
+        time.sleep(max(0.0, server.latency + jitter))
+
+        if roll < server.rate_429:
+            server.count('throttled')
+            return self._send(429, {'message': 'too many requests'}, {'Retry-After': str(server.retry_after)})
+        if roll < server.rate_429 + server.error_rate:
+            server.count('errors')
+            return self._send(500, {'message': 'internal error'})
+
+        body = server.recorded.get((parsed.path, tuple(sorted(params.items()))))
+        if body is None:
+            if parsed.path == AUTOHOME_PATH:
+                body = synthetic_autohome(params, server.series_per_brand)
+            elif parsed.path == DONGCHEDI_PATH:
+                body = synthetic_dongchedi(params, server.series_per_brand)
+            else:
+                server.count('not_found')
+                return self._send(404, {'message': 'not found'})
+        server.count('ok')
+        self._send(200, body)
+
+    def _send(self, status, body, headers=None):
+        payload = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(payload)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(host='127.0.0.1', port=0, **options):
+    """在后台线程中启动模拟服务，port为0时自动选择端口"""
+    server = MockRankServer((host, port), **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="汽车之家/懂车帝排行榜接口的本地模拟服务")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.05, help='每个请求的平均延迟（秒）')
+    parser.add_argument('--jitter', type=float, default=0.0, help='延迟的随机波动范围（秒）')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='返回500错误的比例')
+    parser.add_argument('--rate-429', type=float, default=0.0, help='返回429限流响应的比例')
+    parser.add_argument('--retry-after', type=int, default=0, help='429响应中的Retry-After秒数')
+    parser.add_argument('--series', type=int, default=30, help='合成数据中每个品牌的车系数量')
+    parser.add_argument('--fixtures', help='录制响应所在的HTTP缓存目录，命中的请求返回录制的数据')
+    args = parser.parse_args()
+
+    recorded = load_recorded(args.fixtures) if args.fixtures else {}
+    server = MockRankServer(
+        (args.host, args.port), latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+        rate_429=args.rate_429, retry_after=args.retry_after, series_per_brand=args.series, recorded=recorded
+    )
+    print(f"模拟服务已启动: {server.base_url}，录制响应 {len(recorded)} 条")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"请求统计: {server.stats}")
@@ -1,9 +1,24 @@
 import subprocess
 import sys
 import logging
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 import os
 
+import pandas as pd
+
+# 项目根目录下的共享模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import cube
+import data_store
+import sql_backend
+import data_quality
+from checkpoint import write_csv_atomic
+from collection_metrics import write_report
+
 # 配置日志
 logging.basicConfig(
     level=logging.INFO,
@@ -13,74 +28,197 @@ logging.basicConfig(
     ]
 )
 
-def run_script(script_path):
-    """运行指定的Python脚本并返回执行状态"""
+# 脚本所在目录，采集脚本在该目录下运行
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 各数据源的采集脚本和默认超时时间（秒）
+SOURCES = {
+    'autohome': {'script': '汽车销售数据采集_汽车之家.py', 'timeout': 1800},
+    'dongchedi': {'script': '汽车销量数据采集_懂车帝.py', 'timeout': 1800},
+}
+
+def _stream_output(name, pipe):
+    """逐行转发子进程输出，带上数据源前缀"""
+    for line in iter(pipe.readline, ''):
+        line = line.rstrip()
+        if line:
+            logging.info(f"[{name}] {line}")
+    pipe.close()
+
+def run_source(name, script, timeout, args=()):
+    """在独立进程中运行采集脚本，实时输出日志，超时后终止进程，返回 (退出码, 用时秒数)
+
+    超时的数据源退出码为None。
+    """
+    start = time.monotonic()
+    logging.info(f"开始运行数据源 {name}: {script}")
+    # 进度条在日志中没有意义，关闭子进程中的tqdm输出
+    env = dict(os.environ, PYTHONIOENCODING='utf-8', TQDM_DISABLE='1')
     try:
-        logging.info(f"开始运行脚本: {script_path}")
-        # 获取脚本的绝对路径
-        abs_script_path = os.path.abspath(script_path)
-        # 获取脚本所在目录
-        script_dir = os.path.dirname(abs_script_path)
-        
-        # 设置工作目录为脚本所在目录
-        current_dir = os.getcwd()
-        os.chdir(script_dir)
-        
-        result = subprocess.run(
-            [sys.executable, abs_script_path],
-            check=True,
-            capture_output=True,
-            text=True
+        process = subprocess.Popen(
+            [sys.executable, '-u', os.path.join(SCRIPT_DIR, script), *args],
+            cwd=SCRIPT_DIR,
+            env=env,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            encoding='utf-8',
+            errors='replace'
         )
-        
-        # 恢复原来的工作目录
-        os.chdir(current_dir)
-        
-        logging.info(f"脚本 {script_path} 执行成功")
-        if result.stdout:
-            logging.info(f"输出: {result.stdout}")
-        return True
-    except subprocess.CalledProcessError as e:
-        logging.error(f"脚本 {script_path} 执行失败: {str(e)}")
-        if e.stderr:
-            logging.error(f"错误输出: {e.stderr}")
-        return False
     except Exception as e:
-        logging.error(f"运行脚本 {script_path} 时发生错误: {str(e)}")
-        return False
+        logging.error(f"启动数据源 {name} 时发生错误: {str(e)}")
+        return 1, time.monotonic() - start
+
+    reader = threading.Thread(target=_stream_output, args=(name, process.stdout), daemon=True)
+    reader.start()
+    try:
+        returncode = process.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        logging.error(f"数据源 {name} 超过 {timeout} 秒未完成，终止进程")
+        process.kill()
+        process.wait()
+        returncode = None
+    reader.join(timeout=5)
+    return returncode, time.monotonic() - start
+
+def sync_store(wide, name):
+    """让长格式存储（和数据库）与通过检查的宽表一致"""
+    if data_store.has_store(name):
+        data_store.replace_source(wide, name)
+    if sql_backend.enabled():
+        sql_backend.replace_wide(wide, name)
+
+def validate_source(name, mode):
+    """检查数据源本次输出的宽表，返回 (是否通过, 检查结果)
+
+    quarantine 模式下隔离有问题的数据后通过；block 模式下把输出移入隔离目录，
+    存储恢复为上次提交的数据。
+    """
+    csv_name = data_store.SOURCES[name]['csv']
+    path = os.path.join(SCRIPT_DIR, csv_name)
+    if not os.path.exists(path):
+        return True, None
+    wide = pd.read_csv(path, encoding='utf-8-sig')
+    report = data_quality.check(wide, name)
+    summary = report.summary()
+    logging.info(f"数据源 {name} 质量检查用时 {summary['check_ms']} 毫秒")
+    for line in report.describe():
+        logging.warning(f"  [{name}] {line}")
+    if not report.has_errors or mode == 'warn':
+        summary['action'] = 'passed' if not report.has_errors else 'warned'
+        return True, summary
+
+    if mode == 'quarantine':
+        cleaned, quarantine_path = data_quality.quarantine(wide, report)
+        write_csv_atomic(cleaned, path)
+        sync_store(cleaned, name)
+        logging.warning(f"数据源 {name} 有问题的数据已隔离到 {quarantine_path}")
+        summary['action'] = 'quarantined'
+        return True, summary
+
+    # 拒绝本次数据，输出文件不会被提交
+    os.makedirs(data_quality.QUARANTINE_DIR, exist_ok=True)
+    rejected_path = os.path.join(data_quality.QUARANTINE_DIR,
+                                 f"{name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_rejected.csv")
+    os.replace(path, rejected_path)
+    previous = os.path.join(data_store.ROOT_DIR, csv_name)
+    if os.path.exists(previous):
+        sync_store(pd.read_csv(previous, encoding='utf-8-sig'), name)
+    logging.error(f"数据源 {name} 未通过质量检查，本次输出已移至 {rejected_path}")
+    summary['action'] = 'blocked'
+    return False, summary
 
-def main():
+def main(sources=None, timeout=None, resume=False, quality_mode='quarantine'):
     # 记录开始时间
     start_time = datetime.now()
     logging.info(f"开始数据采集任务 - {start_time}")
-    
-    # 获取项目根目录
-    root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    os.chdir(root_dir)
-    
-    # 定义要运行的脚本列表
-    scripts = [
-        'scripts/汽车销售数据采集_汽车之家.py',
-        'scripts/汽车销量数据采集_懂车帝.py'
-    ]
-    
-    # 运行所有脚本
-    success = True
-    for script in scripts:
-        if not run_script(script):
-            success = False
-            logging.error(f"脚本 {script} 执行失败")
-        else:
-            logging.info(f"脚本 {script} 执行成功")
-    
+
+    sources = sources or list(SOURCES)
+    # 继续上次超时或中断的采集，已完成的(品牌, 周期)从检查点读取
+    script_args = ['--resume'] if resume else []
+
+    # 各数据源访问不同的主机，在独立进程中并发运行，总用时取决于最慢的数据源
+    results = {}
+    with ThreadPoolExecutor(max_workers=len(sources)) as pool:
+        futures = {
+            pool.submit(run_source, name, SOURCES[name]['script'], timeout or SOURCES[name]['timeout'], script_args): name
+            for name in sources
+        }
+        for future in as_completed(futures):
+            name = futures[future]
+            results[name] = future.result()
+            returncode, duration = results[name]
+            if returncode == 0:
+                logging.info(f"数据源 {name} 执行成功，用时 {duration:.1f} 秒")
+            elif returncode is None:
+                logging.error(f"数据源 {name} 执行超时，用时 {duration:.1f} 秒")
+            else:
+                logging.error(f"数据源 {name} 执行失败，退出码 {returncode}，用时 {duration:.1f} 秒")
+
+    success = all(returncode == 0 for returncode, _ in results.values())
+
+    # 构建预计算结果前检查采集到的数据
+    quality = {}
+    for name in sources:
+        try:
+            passed, quality[name] = validate_source(name, quality_mode)
+        except Exception as e:
+            passed, quality[name] = False, None
+            logging.error(f"检查数据源 {name} 的数据质量时发生错误: {str(e)}")
+        success = success and passed
+        if quality[name] is not None:
+            try:
+                write_report(f'quality_{name}', quality[name])
+            except Exception as e:
+                logging.error(f"写入质量检查报告时发生错误: {str(e)}")
+
+    # 数据更新后重新构建预计算结果
+    try:
+        version = cube.build_and_save()
+        logging.info(f"预计算结果已更新，数据版本: {version}")
+    except Exception as e:
+        success = False
+        logging.error(f"构建预计算结果时发生错误: {str(e)}")
+
     # 记录结束时间和总用时
     end_time = datetime.now()
     duration = end_time - start_time
     logging.info(f"数据采集任务结束 - 总用时: {duration}")
-    
+    report = {
+        'started_at': start_time.isoformat(timespec='seconds'),
+        'total_seconds': round(duration.total_seconds(), 3),
+        'success': success,
+    }
+    # 每次都写出所有数据源的字段，本次没有运行或没有检查的数据源留空，汇总CSV的列保持一致
+    for name in SOURCES:
+        report[f'{name}_seconds'] = None
+        report[f'{name}_returncode'] = None
+        report[f'{name}_quality'] = None
+    for name in sources:
+        returncode, source_duration = results[name]
+        status = '成功' if returncode == 0 else ('超时' if returncode is None else f'失败({returncode})')
+        logging.info(f"  {name}: {status}, {source_duration:.1f} 秒")
+        report[f'{name}_seconds'] = round(source_duration, 3)
+        report[f'{name}_returncode'] = returncode
+        if quality.get(name) is not None:
+            report[f'{name}_quality'] = quality[name]['action']
+
+    # 写出本次采集任务的运行报告
+    try:
+        logging.info(f"运行报告已写入 {write_report('orchestrator', report)}")
+    except Exception as e:
+        logging.error(f"写入运行报告时发生错误: {str(e)}")
+
     # 如果有脚本失败，返回非零状态码
     if not success:
         sys.exit(1)
 
 if __name__ == '__main__':
-    main() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="并发运行各数据源的采集脚本")
+    parser.add_argument('--sources', nargs='+', choices=list(SOURCES), help='只运行指定的数据源')
+    parser.add_argument('--timeout', type=int, help='每个数据源的超时时间（秒），默认使用各数据源的设置')
+    parser.add_argument('--resume', action='store_true', help='各采集脚本从上次中断的检查点继续')
+    parser.add_argument('--quality-mode', choices=data_quality.MODES, default='quarantine',
+                        help='数据质量检查未通过时的处理方式：拒绝、隔离问题数据或只报告')
+    args = parser.parse_args()
+    main(sources=args.sources, timeout=args.timeout, resume=args.resume, quality_mode=args.quality_mode)
@@ -0,0 +1,46 @@
+import heapq
+
+from incremental import FIXED_COLUMNS
+
+
+def _merge_periods(old_periods, new_periods):
+    """归并两个有序的周期列表并去重
+
+    周期列均为定宽格式（如202501、2025-01-07），字符串顺序即时间顺序，无需解析日期。
+    """
+    merged = []
+    for period in heapq.merge(old_periods, sorted(new_periods)):
+        if not merged or merged[-1] != period:
+            merged.append(period)
+    return merged
+
+
+def _dedupe(frame, keys, label):
+    """合并键重复的行，每列取最后一个非空值，返回以 keys 为索引的宽表
+
+    有重复时输出被合并的行数，避免数据被悄悄丢弃。
+    """
+    duplicates = int(frame.duplicated(subset=keys).sum())
+    if not duplicates:
+        return frame.set_index(keys)
+    print(f"{label}中有 {duplicates} 行与其他行的 ({', '.join(keys)}) 重复，已按最后出现的非空值合并")
+    return frame.groupby(keys, sort=False, dropna=False).last()
+
+
+def upsert_wide(old, new, keys=FIXED_COLUMNS):
+    """以 keys 为键将新数据写入旧宽表，只覆盖新数据中非空的单元格
+
+    新出现的行追加在末尾，新出现的周期列按时间顺序插入。键重复的行先合并为一行。
+    """
+    if new.empty:
+        return new if old is None else old
+    new = _dedupe(new, keys, '新数据')
+    if old is None or old.empty:
+        return new[sorted(new.columns)].reset_index()
+    old = _dedupe(old, keys, '已有数据')
+    columns = _merge_periods(list(old.columns), list(new.columns))
+    rows = old.index.append(new.index.difference(old.index))
+    result = old.reindex(index=rows, columns=columns)
+    result.update(new)
+    return result.reset_index()
+
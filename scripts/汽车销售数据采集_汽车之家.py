@@ -2,9 +2,23 @@
 import requests
 import pandas as pd
 from datetime import datetime, timedelta
-import time
 import os
-from tqdm import tqdm  # 添加进度条显示
+import math
+import argparse
+import sys
+from fetch_engine import FetchEngine
+from functools import partial
+from incremental import find_existing_csv, existing_periods, select_periods
+from http_cache import ResponseCache, DEFAULT_CACHE_DIR, period_ttl
+from upsert import upsert_wide
+from collection_metrics import CollectionMetrics
+from checkpoint import CheckpointStore, write_csv_atomic
+import http_session
+
+# 项目根目录下的共享模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import data_store
+import sql_backend
 
 # 完整品牌ID映射
 brandid = {
@@ -24,16 +38,22 @@ brandid = {
     '奥迪': '33'
 }
 
-def get_sales_data(brand_id, date, retry_count=3):
-    url = f"https://cars.app.autohome.com.cn/carext/recrank/all/getrecranklistpageresult2"
-    params = {
+# 排行榜接口地址，可通过环境变量 AUTOHOME_BASE_URL 或 --base-url 指向本地模拟服务
+RANK_PATH = "/carext/recrank/all/getrecranklistpageresult2"
+url = os.getenv('AUTOHOME_BASE_URL', "https://cars.app.autohome.com.cn").rstrip('/') + RANK_PATH
+
+# 每页返回的车系数量
+PAGE_SIZE = 50
+
+def build_params(brand_id, date, pageindex=1):
+    return {
         'from': '28',
         'pm': '2',
         'pluginversion': '11.65.0',
         'model': '1',
         'channel': '0',
-        'pageindex': '1',
-        'pagesize': '50',
+        'pageindex': str(pageindex),
+        'pagesize': str(PAGE_SIZE),
         'typeid': '1',
         'subranktypeid': '2',  # 周度数据
         'levelid': '0',
@@ -41,26 +61,53 @@ def get_sales_data(brand_id, date, retry_count=3):
         'brandid': brand_id,
         'week': date
     }
+
+def week_ttl(date):
+    """周度数据的缓存有效期"""
+    return period_ttl(datetime.strptime(date, '%Y-%m-%d') + timedelta(weeks=1))
+
+def get_sales_data(brand_id, date, pageindex=1, cache=None, metrics=None):
+    params = build_params(brand_id, date, pageindex)
     
     headers = {
         'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
     }
     
-    for attempt in range(retry_count):
-        try:
-            response = requests.get(url, params=params, headers=headers)
-            response.raise_for_status()
-            data = response.json()
+    # 优先使用缓存，已结束的周度使用较长的缓存有效期
+    if cache is not None:
+        data = cache.get(url, params, week_ttl(date))
+        if data is not None or cache.offline:
             return data
-        except requests.RequestException as e:
-            if attempt == retry_count - 1:
-                print(f"网络请求最终失败: {str(e)}")
-                return None
-            print(f"第{attempt + 1}次请求失败，正在重试...")
-            time.sleep(2)  # 失败后等待2秒再重试
-        except ValueError as e:
-            print(f"JSON解析出错: {str(e)}")
-            return None
+    
+    # 共享会话复用连接，失败时由传输层按指数退避重试，重试和等待时间由传输层记录
+    try:
+        response = http_session.get(url, params=params, headers=headers, timeout=http_session.DEFAULT_TIMEOUT)
+        if metrics is not None:
+            metrics.record_request(http_session.attempt_seconds(), len(response.content), ok=response.ok)
+        response.raise_for_status()
+        data = response.json()
+        if cache is not None:
+            cache.put(url, params, data)
+        return data
+    except requests.RequestException as e:
+        if metrics is not None and getattr(e, 'response', None) is None:
+            # 重试后仍然没有拿到响应的请求
+            metrics.record_request(http_session.attempt_seconds(), ok=False)
+        print(f"网络请求最终失败: {str(e)}")
+        return None
+    except ValueError as e:
+        print(f"JSON解析出错: {str(e)}")
+        return None
+
+def total_pages(data):
+    """从第一页响应中读取总页数，接口没有返回总数时按单页处理"""
+    result = (data or {}).get('result') or {}
+    if result.get('pagecount'):
+        return int(result['pagecount'])
+    for key in ('rowcount', 'totalcount', 'total'):
+        if result.get(key):
+            return math.ceil(int(result[key]) / PAGE_SIZE)
+    return 1
 
 def extract_car_info(data, brand_name, week_id):
     cars_list = []
@@ -91,38 +138,111 @@ def generate_week_dates():
     
     return week_dates
 
-def main():
+def fetch_page(brand_name, brand_id, week_date, pageindex=1, cache=None, metrics=None):
+    """获取并提取单个品牌单周一页的数据，返回 (数据行, 总页数)
+
+    请求最终失败（或离线回放时缓存中没有该页）时抛出异常，该(品牌, 周度)记为失败，不写入检查点。
+    """
+    data = get_sales_data(brand_id, week_date, pageindex, cache=cache, metrics=metrics)
+    if data is None:
+        raise RuntimeError(f"品牌 {brand_name} 的 {week_date} 第{pageindex}页没有获取到数据")
+    week_data = extract_car_info(data, brand_name, week_date)
+    if metrics is not None:
+        metrics.record_rows(len(week_data))
+    return week_data, total_pages(data)
+
+def cached_page(brand_name, brand_id, week_date, pageindex=1, cache=None, metrics=None):
+    """缓存命中时直接返回 (数据行, 总页数)，否则返回None"""
+    if cache is None:
+        return None
+    data = cache.get(url, build_params(brand_id, week_date, pageindex), week_ttl(week_date))
+    if data is None:
+        return None
+    if metrics is not None:
+        metrics.record_cache_hit()
+    return extract_car_info(data, brand_name, week_date), total_pages(data)
+
+def main(rate=2.0, burst=4, concurrency=8, per_host=4, full=False, refetch=2, cache=None, metrics=None, retries=3,
+         checkpoints=None, resume=False):
     # 创建一个空的DataFrame来存储所有品牌的数据
     all_brands_data = pd.DataFrame()
+    existing_file = find_existing_csv('汽车销量数据_autohome_周度.csv')
     
-    # 获取周度日期列表
+    # 离线回放时不需要限速
+    if cache is not None and cache.offline:
+        rate = 0
+    
+    # 获取周度日期列表，增量模式下只获取缺失的周度和最近refetch周
     week_dates = generate_week_dates()
-    print(f"将获取从 {week_dates[0]} 到 {week_dates[-1]} 的周度数据")
-    
-    # 遍历每个品牌
-    for brand_name, brand_id in tqdm(brandid.items(), desc="处理品牌"):
-        brand_data_list = []
-        print(f"\n开始处理品牌: {brand_name}")
-        
-        # 遍历每个周度获取数据
-        for week_date in tqdm(week_dates, desc=f"处理{brand_name}的周度数据", leave=False):
-            try:
-                # 获取数据
-                data = get_sales_data(brand_id, week_date)
-                if data:
-                    # 提取数据
-                    week_data = extract_car_info(data, brand_name, week_date)
-                    if week_data:  # 确保有数据再处理
-                        # 转换为DataFrame
-                        week_df = pd.DataFrame(week_data)
-                        brand_data_list.append(week_df)
-                
-                time.sleep(1.5)  # 适当增加延时
-            except Exception as e:
-                print(f"处理品牌 {brand_name} 的 {week_date} 数据时出错: {str(e)}")
+    if not full:
+        week_dates = select_periods(week_dates, existing_periods(existing_file), refetch)
+    if not week_dates:
+        print("没有需要更新的周度数据")
+        return None
+    print(f"将获取从 {week_dates[0]} 到 {week_dates[-1]} 的 {len(week_dates)} 个周度数据")
+    
+    # 所有请求访问同一主机，连接池大小与主机并发上限一致，保证每个并发请求都能复用连接
+    per_host = min(per_host, concurrency)
+    http_session.configure(pool_size=per_host, retries=retries, metrics=metrics)
+    
+    # 所有(品牌, 周度)请求交给抓取引擎并发执行，总速率由令牌桶控制，同一主机的并发数不超过per_host
+    engine = FetchEngine(rate=rate, burst=burst, max_workers=concurrency, per_host=per_host, metrics=metrics)
+    fetch = partial(fetch_page, cache=cache, metrics=metrics)
+    lookup = partial(cached_page, cache=cache, metrics=metrics)
+    brand_data_lists = {brand_name: [] for brand_name in brandid}
+    
+    # 继续上次中断的采集时，已完成的(品牌, 周度)直接使用检查点中的数据
+    completed = checkpoints.load() if checkpoints is not None and resume else {}
+    if checkpoints is not None and not resume:
+        checkpoints.clear()
+    for (brand_name, week_date), rows in completed.items():
+        if brand_name in brand_data_lists and week_date in week_dates and rows:
+            brand_data_lists[brand_name].append((week_date, pd.DataFrame(rows)))
+    if completed:
+        print(f"从检查点恢复 {len(completed)} 个(品牌, 周度)的数据")
+    
+    # 每个(品牌, 周度)剩余的分页数、已获取的数据行和是否有分页失败，所有分页完成后写入检查点
+    pending = {}
+    unit_rows = {}
+    failed = set()
+    
+    def finish_page(unit, week_data):
+        unit_rows.setdefault(unit, []).extend(week_data)
+        pending[unit] -= 1
+        if pending[unit] == 0 and unit not in failed and checkpoints is not None:
+            checkpoints.save(*unit, unit_rows.pop(unit))
+    
+    # 先获取每个(品牌, 周度)的第一页，从中读取总页数，再并发获取剩余分页
+    tasks = [(brand_name, brand_id, week_date, 1) for brand_name, brand_id in brandid.items()
+             for week_date in week_dates if (brand_name, week_date) not in completed]
+    for desc in ("获取周度数据", "获取后续分页"):
+        next_tasks = []
+        # 缓存命中的请求直接使用缓存结果，不占用限速令牌
+        results = engine.map(url, fetch, tasks, desc=desc, lookup=lookup)
+        for (brand_name, brand_id, week_date, pageindex), result, error in results:
+            unit = (brand_name, week_date)
+            if error is not None:
+                print(f"处理品牌 {brand_name} 的 {week_date} 第{pageindex}页数据时出错: {str(error)}")
+                failed.add(unit)
                 continue
-        
-        # 合并当前品牌的所有周度数据
+            week_data, page_count = result
+            if week_data:  # 确保有数据再处理
+                brand_data_lists[brand_name].append((week_date, pd.DataFrame(week_data)))
+            if pageindex == 1:
+                pending[unit] = page_count
+                next_tasks.extend((brand_name, brand_id, week_date, page) for page in range(2, page_count + 1))
+            finish_page(unit, week_data)
+        tasks = next_tasks
+        if not tasks:
+            break
+    
+    # 有分页失败的(品牌, 周度)数据不完整，丢弃其已获取的分页，该周期保留为空，不写入CSV和存储
+    if failed:
+        print(f"{len(failed)} 个(品牌, 周度)有分页获取失败，不保存这些单元的数据")
+    
+    # 按品牌顺序合并数据
+    for brand_name, brand_pages in brand_data_lists.items():
+        brand_data_list = [frame for week_date, frame in brand_pages if (brand_name, week_date) not in failed]
         if brand_data_list:
             brand_data = pd.concat(brand_data_list, ignore_index=True)
             # 按汽车品牌、车型、售价分组，对每个周的销量求和
@@ -134,44 +254,40 @@ def main():
         else:
             print(f"品牌 {brand_name} 的数据提取失败。")
     
-    # 处理缺失值，将缺失的销量数据填充为0
-    all_brands_data = all_brands_data.fillna(0)
+    # 品牌内其他周期有数据而本周期没有的车型销量为0（在分组求和时已填充），
+    # 剩余的空值是该品牌的请求失败、没有获取到的周期，保留为空，写入时不覆盖已有数据
     
-    # 如果同文件夹下已经有这个CSV文件，读取文件在基础上更新数据
-    if os.path.exists('汽车销量数据_autohome_周度.csv'):
+    # 将本次获取的数据写入长格式存储，只重写涉及的年份分区
+    if not all_brands_data.empty:
         try:
-            old_data = pd.read_csv('汽车销量数据_autohome_周度.csv', encoding='utf-8-sig')
-            # 合并新旧数据，根据汽车品牌、车型、售价进行合并
-            merged_data = pd.merge(old_data, all_brands_data, on=['汽车品牌', '车型', '售价'], how='outer')
-            # 找出新旧数据中相同周度的列
-            common_columns = set(old_data.columns).intersection(set(all_brands_data.columns))
-            common_columns = [col for col in common_columns if col not in ['汽车品牌', '车型', '售价']]
-            # 更新相同周度的数据，使用新数据覆盖旧数据
-            for col in common_columns:
-                merged_data[col] = merged_data[col + '_y'].fillna(merged_data[col + '_x'])
-                merged_data.drop([col + '_x', col + '_y'], axis=1, inplace=True)
-            all_brands_data = merged_data
-            print("已更新现有数据文件")
+            data_store.write_wide(all_brands_data, 'autohome')
         except Exception as e:
-            print(f"更新现有数据文件时出错: {str(e)}")
-    
-    # 分离固定列和周度列
-    fixed_columns = ['汽车品牌', '车型', '售价']
-    week_columns = [col for col in all_brands_data.columns if col not in fixed_columns]
-    
-    # 对周度列进行排序
-    sorted_week_columns = sorted(week_columns, key=lambda x: pd.to_datetime(x))
-    
-    # 合并固定列和排序后的周度列
-    sorted_columns = fixed_columns + sorted_week_columns
+            print(f"写入长格式存储时出错: {str(e)}")
+        # 启用数据库后端时在一个事务中写入数据库
+        if sql_backend.enabled():
+            try:
+                sql_backend.write_wide(all_brands_data, 'autohome')
+            except Exception as e:
+                print(f"写入数据库时出错: {str(e)}")
     
-    # 按排序后的列重新排列 DataFrame
-    all_brands_data = all_brands_data[sorted_columns]
+    # 如果已经有这个CSV文件，以(汽车品牌, 车型, 售价)为键把新数据写入已有数据，周度列保持时间顺序
+    old_data = None
+    if existing_file:
+        try:
+            old_data = pd.read_csv(existing_file, encoding='utf-8-sig')
+        except Exception as e:
+            print(f"读取现有数据文件时出错: {str(e)}")
+    all_brands_data = upsert_wide(old_data, all_brands_data)
+    if old_data is not None:
+        print("已更新现有数据文件")
     
     try:
-        # 保存到CSV，使用UTF-8编码
-        all_brands_data.to_csv('汽车销量数据_autohome_周度.csv', index=False, encoding='utf-8-sig')
+        # 保存到CSV，使用UTF-8编码，先写临时文件再替换，中断时原文件保持完整
+        write_csv_atomic(all_brands_data, '汽车销量数据_autohome_周度.csv')
         print("数据已保存到 汽车销量数据_autohome_周度.csv")
+        # 结果已完整保存，清空检查点
+        if checkpoints is not None:
+            checkpoints.clear()
     except Exception as e:
         print(f"保存数据文件时出错: {str(e)}")
         # 尝试使用备份文件名保存
@@ -185,7 +301,32 @@ def main():
     return all_brands_data
 
 if __name__ == "__main__":
-    df = main() 
+    parser = argparse.ArgumentParser(description="汽车之家周度销量数据采集")
+    parser.add_argument('--rate', type=float, default=2.0, help='每秒允许的请求数，<=0表示不限速')
+    parser.add_argument('--burst', type=int, default=4, help='令牌桶容量（允许的突发请求数）')
+    parser.add_argument('--concurrency', type=int, default=8, help='抓取线程数')
+    parser.add_argument('--per-host', type=int, default=4, help='同一主机的最大并发请求数（不超过抓取线程数）')
+    parser.add_argument('--retries', type=int, default=3, help='请求失败时的最大重试次数（指数退避）')
+    parser.add_argument('--full', action='store_true', help='重新获取全部历史周度数据')
+    parser.add_argument('--refetch', type=int, default=2, help='增量模式下重新获取最近几周的数据以修正延迟更新')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help='HTTP响应缓存目录')
+    parser.add_argument('--no-cache', action='store_true', help='不使用响应缓存')
+    parser.add_argument('--offline', action='store_true', help='离线回放模式，只从缓存读取响应')
+    parser.add_argument('--base-url', help='接口根地址，如 http://127.0.0.1:8765')
+    parser.add_argument('--resume', action='store_true', help='从上次中断的检查点继续，跳过已完成的(品牌, 周度)')
+    parser.add_argument('--no-checkpoint', action='store_true', help='不写入检查点')
+    args = parser.parse_args()
+    if args.base_url:
+        url = args.base_url.rstrip('/') + RANK_PATH
+    cache = None if args.no_cache else ResponseCache(args.cache_dir, offline=args.offline)
+    metrics = CollectionMetrics('autohome')
+    try:
+        df = main(rate=args.rate, burst=args.burst, concurrency=args.concurrency, per_host=args.per_host,
+                  full=args.full, refetch=args.refetch, cache=cache, metrics=metrics, retries=args.retries,
+                  checkpoints=None if args.no_checkpoint else CheckpointStore('autohome'), resume=args.resume)
+    finally:
+        # 无论成功与否都写出运行报告
+        print(f"采集指标已写入 {metrics.write_report()}")
     
     
 
@@ -2,26 +2,68 @@ import requests
 import pandas as pd
 from datetime import datetime, timedelta
 import os
+import argparse
+import sys
+from incremental import find_existing_csv, existing_periods, select_periods
+from http_cache import ResponseCache, DEFAULT_CACHE_DIR, period_ttl
+from upsert import upsert_wide
+from collection_metrics import CollectionMetrics
+from checkpoint import CheckpointStore, write_csv_atomic
+import http_session
+
+# 项目根目录下的共享模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import data_store
+import sql_backend
+
 # 设置请求头，模拟浏览器访问
 headers = {
     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
 }
 
-url_header = 'https://www.dongchedi.com/motor/pc/car/rank_data?'
-
-def get_car_data(url, headers):
+# 排行榜接口地址，可通过环境变量 DONGCHEDI_BASE_URL 或 --base-url 指向本地模拟服务
+RANK_PATH = '/motor/pc/car/rank_data'
+url_header = os.getenv('DONGCHEDI_BASE_URL', 'https://www.dongchedi.com').rstrip('/') + RANK_PATH
+
+def build_params(brand_id_value, month_id):
+    return {
+        'brand_id': brand_id_value,
+        'month': month_id,
+        'rank_data_type': '11',
+        'new_energy_type': '1,2,3'
+    }
+
+def month_ttl(month_id):
+    """月度数据的缓存有效期，以下月1号作为周期结束时间"""
+    month_start = datetime.strptime(month_id, '%Y%m')
+    return period_ttl((month_start + timedelta(days=32)).replace(day=1))
+
+def get_car_data(url, headers, params=None, cache=None, ttl=None, metrics=None):
+    # 优先使用缓存
+    if cache is not None:
+        json_data = cache.get(url, params, ttl)
+        if json_data is not None and metrics is not None:
+            metrics.record_cache_hit()
+        if json_data is not None or cache.offline:
+            return json_data
     try:
-        # 发送 GET 请求
-        response = requests.get(url, headers=headers)
+        # 发送 GET 请求，重试和退避等待由传输层记录，这里记录最后一次尝试的延迟
+        response = http_session.get(url, params=params, headers=headers, timeout=http_session.DEFAULT_TIMEOUT)
+        if metrics is not None:
+            metrics.record_request(http_session.attempt_seconds(), len(response.content), ok=response.status_code == 200)
         # 检查响应状态码
         if response.status_code == 200:
             # 解析 JSON 数据
             json_data = response.json()
+            if cache is not None:
+                cache.put(url, params, json_data)
             return json_data
         else:
             print(f"请求失败，状态码: {response.status_code}")
             return None
     except requests.RequestException as e:
+        if metrics is not None:
+            metrics.record_request(http_session.attempt_seconds(), ok=False)
         print(f"网络请求出错: {str(e)}")
         return None
     except ValueError as e:
@@ -64,87 +106,139 @@ brand_id = {'小鹏': '195',
             '奥迪': '2'
             }
 
-# 获取当前日期
-current_date = datetime.now()
-
-# 获取当前月份的上一个月
-last_month_date = current_date.replace(day=1) - timedelta(days=1)
-
-month_ids = []
-start_date = datetime(2022, 2, 1)
-
-while start_date <= last_month_date:
-    month_ids.append(start_date.strftime('%Y%m'))
-    start_date = start_date + timedelta(days=32)  # 加32天确保跨月
-    start_date = start_date.replace(day=1)  # 重置为下月1号
+def generate_month_ids():
+    """生成从2022年2月到上个月的月份列表"""
+    # 获取当前日期
+    current_date = datetime.now()
     
-# 创建一个空的DataFrame来存储所有品牌的数据
-all_brands_data = pd.DataFrame()
-
-# 遍历每个品牌
-for brand_name, brand_id_value in brand_id.items():
-    brand_data_list = []
+    # 获取当前月份的上一个月
+    last_month_date = current_date.replace(day=1) - timedelta(days=1)
+    
+    month_ids = []
+    start_date = datetime(2022, 2, 1)
+    
+    while start_date <= last_month_date:
+        month_ids.append(start_date.strftime('%Y%m'))
+        start_date = start_date + timedelta(days=32)  # 加32天确保跨月
+        start_date = start_date.replace(day=1)  # 重置为下月1号
+    
+    return month_ids
 
-    # 遍历每个月份获取数据
-    for month_id in month_ids:
+def main(full=False, refetch=1, cache=None, metrics=None, pool_size=4, retries=3, checkpoints=None, resume=False):
+    existing_file = find_existing_csv('汽车销量数据.csv')
+    
+    # 增量模式下只获取缺失的月份和最近refetch个月
+    month_ids = generate_month_ids()
+    if not full:
+        month_ids = select_periods(month_ids, existing_periods(existing_file), refetch)
+    if not month_ids:
+        print("没有需要更新的月度数据")
+        return None
+    print(f"将获取从 {month_ids[0]} 到 {month_ids[-1]} 的 {len(month_ids)} 个月度数据")
+    
+    # 所有请求共享一个带连接池和重试的会话
+    http_session.configure(pool_size=pool_size, retries=retries, metrics=metrics)
+    
+    # 创建一个空的DataFrame来存储所有品牌的数据
+    all_brands_data = pd.DataFrame()
+    
+    # 继续上次中断的采集时，已完成的(品牌, 月份)直接使用检查点中的数据
+    completed = checkpoints.load() if checkpoints is not None and resume else {}
+    if checkpoints is not None and not resume:
+        checkpoints.clear()
+    if completed:
+        print(f"从检查点恢复 {len(completed)} 个(品牌, 月份)的数据")
+    
+    # 遍历每个品牌
+    for brand_name, brand_id_value in brand_id.items():
+        brand_data_list = []
+    
+        # 遍历每个月份获取数据
+        for month_id in month_ids:
+            if (brand_name, month_id) in completed:
+                if completed[(brand_name, month_id)]:
+                    brand_data_list.append(pd.DataFrame(completed[(brand_name, month_id)]))
+                continue
+            try:
+                # 获取数据
+                json_data = get_car_data(url_header, headers, build_params(brand_id_value, month_id),
+                                         cache=cache, ttl=month_ttl(month_id), metrics=metrics)
+                if json_data:
+                    # 提取数据
+                    month_data = extract_car_data(json_data, month_id)
+                    if metrics is not None:
+                        metrics.record_rows(len(month_data))
+                    if month_data:  # 确保有数据再处理
+                        # 转换为DataFrame
+                        month_df = pd.DataFrame(month_data)
+                        brand_data_list.append(month_df)
+                    # 该(品牌, 月份)已完成，写入检查点
+                    if checkpoints is not None:
+                        checkpoints.save(brand_name, month_id, month_data)
+            except Exception as e:
+                print(f"处理品牌 {brand_name} 的 {month_id} 数据时出错: {str(e)}")
+                continue
+    
+        # 合并当前品牌的所有月份数据
+        if brand_data_list:
+            brand_data = pd.concat(brand_data_list, ignore_index=True)
+            # 按汽车品牌、车型、售价分组，对每个月的销量求和
+            brand_data = brand_data.groupby(['汽车品牌', '车型', '售价'], as_index=False).sum()
+    
+            # 将当前品牌数据合并到总的DataFrame中
+            all_brands_data = pd.concat([all_brands_data, brand_data], ignore_index=True)
+            print(f"品牌 {brand_name} 的数据提取成功。")
+        else:
+            print(f"品牌 {brand_name} 的数据提取失败。")
+    
+    # 品牌内其他周期有数据而本周期没有的车型销量为0（在分组求和时已填充），
+    # 剩余的空值是该品牌的请求失败、没有获取到的周期，保留为空，写入时不覆盖已有数据
+    
+    # 将本次获取的数据写入长格式存储，只重写涉及的年份分区
+    if not all_brands_data.empty:
         try:
-            # 定义目标 URL
-            url = url_header + 'brand_id=' + brand_id_value + '&month=' + month_id + '&rank_data_type=11&new_energy_type=1%2C2%2C3'
-
-            # 获取数据
-            json_data = get_car_data(url, headers)
-            if json_data:
-                # 提取数据
-                month_data = extract_car_data(json_data, month_id)
-                if month_data:  # 确保有数据再处理
-                    # 转换为DataFrame
-                    month_df = pd.DataFrame(month_data)
-                    brand_data_list.append(month_df)
+            data_store.write_wide(all_brands_data, 'dongchedi')
         except Exception as e:
-            print(f"处理品牌 {brand_name} 的 {month_id} 数据时出错: {str(e)}")
-            continue
-
-    # 合并当前品牌的所有月份数据
-    if brand_data_list:
-        brand_data = pd.concat(brand_data_list, ignore_index=True)
-        # 按汽车品牌、车型、售价分组，对每个月的销量求和
-        brand_data = brand_data.groupby(['汽车品牌', '车型', '售价'], as_index=False).sum()
-
-        # 将当前品牌数据合并到总的DataFrame中
-        all_brands_data = pd.concat([all_brands_data, brand_data], ignore_index=True)
-        print(f"品牌 {brand_name} 的数据提取成功。")
-    else:
-        print(f"品牌 {brand_name} 的数据提取失败。")
-
-# 处理缺失值，将缺失的销量数据填充为0
-all_brands_data = all_brands_data.fillna(0)
-
-# 如果同文件夹下已经有这个CSV文件，读取文件在基础上更新数据
-if os.path.exists('汽车销量数据.csv'):
-    old_data = pd.read_csv('汽车销量数据.csv', encoding='utf-8-sig')
-    # 合并新旧数据，根据汽车品牌、车型、售价进行合并
-    merged_data = pd.merge(old_data, all_brands_data, on=['汽车品牌', '车型', '售价'], how='outer')
-    # 找出新旧数据中相同月份的列
-    common_columns = set(old_data.columns).intersection(set(all_brands_data.columns))
-    common_columns = [col for col in common_columns if col not in ['汽车品牌', '车型', '售价']]
-    # 更新相同月份的数据，使用新数据覆盖旧数据
-    for col in common_columns:
-        merged_data[col] = merged_data[col + '_y'].fillna(merged_data[col + '_x'])
-        merged_data.drop([col + '_x', col + '_y'], axis=1, inplace=True)
-    all_brands_data = merged_data
-
-# 分离固定列和月份列
-fixed_columns = ['汽车品牌', '车型', '售价']
-month_columns = [col for col in all_brands_data.columns if col not in fixed_columns]
-
-# 对月份列进行排序
-sorted_month_columns = sorted(month_columns, key=lambda x: pd.to_datetime(x, format='%Y%m'))
-
-# 合并固定列和排序后的月份列
-sorted_columns = fixed_columns + sorted_month_columns
-
-# 按排序后的列重新排列 DataFrame
-all_brands_data = all_brands_data[sorted_columns]
-
-# 保存为CSV文件，使用UTF-8编码
-all_brands_data.to_csv('汽车销量数据.csv', index=False, encoding='utf-8-sig')
\ No newline at end of file
+            print(f"写入长格式存储时出错: {str(e)}")
+        # 启用数据库后端时在一个事务中写入数据库
+        if sql_backend.enabled():
+            try:
+                sql_backend.write_wide(all_brands_data, 'dongchedi')
+            except Exception as e:
+                print(f"写入数据库时出错: {str(e)}")
+    
+    # 如果已经有这个CSV文件，以(汽车品牌, 车型, 售价)为键把新数据写入已有数据，月份列保持时间顺序
+    old_data = pd.read_csv(existing_file, encoding='utf-8-sig') if existing_file else None
+    all_brands_data = upsert_wide(old_data, all_brands_data)
+    
+    # 保存为CSV文件，使用UTF-8编码，先写临时文件再替换，中断时原文件保持完整
+    write_csv_atomic(all_brands_data, '汽车销量数据.csv')
+    # 结果已完整保存，清空检查点
+    if checkpoints is not None:
+        checkpoints.clear()
+    return all_brands_data
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="懂车帝月度销量数据采集")
+    parser.add_argument('--pool-size', type=int, default=4, help='HTTP连接池大小')
+    parser.add_argument('--retries', type=int, default=3, help='请求失败时的最大重试次数（指数退避）')
+    parser.add_argument('--full', action='store_true', help='重新获取全部历史月度数据')
+    parser.add_argument('--refetch', type=int, default=1, help='增量模式下重新获取最近几个月的数据以修正延迟更新')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help='HTTP响应缓存目录')
+    parser.add_argument('--no-cache', action='store_true', help='不使用响应缓存')
+    parser.add_argument('--offline', action='store_true', help='离线回放模式，只从缓存读取响应')
+    parser.add_argument('--base-url', help='接口根地址，如 http://127.0.0.1:8765')
+    parser.add_argument('--resume', action='store_true', help='从上次中断的检查点继续，跳过已完成的(品牌, 月份)')
+    parser.add_argument('--no-checkpoint', action='store_true', help='不写入检查点')
+    args = parser.parse_args()
+    if args.base_url:
+        url_header = args.base_url.rstrip('/') + RANK_PATH
+    cache = None if args.no_cache else ResponseCache(args.cache_dir, offline=args.offline)
+    metrics = CollectionMetrics('dongchedi')
+    try:
+        main(full=args.full, refetch=args.refetch, cache=cache, metrics=metrics,
+             pool_size=args.pool_size, retries=args.retries,
+             checkpoints=None if args.no_checkpoint else CheckpointStore('dongchedi'), resume=args.resume)
+    finally:
+        # 无论成功与否都写出运行报告
+        print(f"采集指标已写入 {metrics.write_report()}")
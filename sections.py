@@ -0,0 +1,364 @@
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+from chart_render import line_chart, scatter_trace, use_webgl
+from growth import growth_table
+from table_format import column_config, number_table, PERCENT_FORMAT
+
+# 各部分图表和表格的构建函数，输入为 app.load_cube 返回的聚合表，不依赖页面控件
+
+# 横向放在图表上方的图例
+TOP_LEGEND = dict(
+    orientation="h",
+    yanchor="bottom",
+    y=1.02,
+    xanchor="right",
+    x=1
+)
+
+
+def with_total(table):
+    """添加合计行"""
+    table = table.copy()
+    table.loc['合计'] = table.sum()
+    return table
+
+
+def in_range(wide, start=None, end=None):
+    """只保留可见时间范围内的日期列"""
+    return wide.loc[:, start:end]
+
+
+def add_forecast(fig, forecast, brand, end=None):
+    """在各车型曲线末端接上虚线表示的预测，可见范围不到最后一期时不显示"""
+    if forecast is None or brand not in forecast.index:
+        return fig
+    forecast = forecast.loc[[brand]]
+    if end is not None and pd.Timestamp(end) < forecast['日期'].min():
+        return fig
+    for trace in list(fig.data):
+        points = forecast[forecast['车型'] == trace.name]
+        if points.empty:
+            continue
+        fig.add_trace(
+            scatter_trace(
+                len(points),
+                name=f'{trace.name} 预测',
+                x=points['日期'],
+                y=points['预测销量'],
+                mode='lines+markers',
+                line=dict(color=trace.line.color, dash='dash'),
+                marker=dict(symbol='circle-open'),
+                legendgroup=trace.legendgroup,
+                showlegend=False
+            )
+        )
+    return fig
+
+
+def metric_long(wide, metric):
+    """将车型×日期的指标宽表转换为绘图用的长表"""
+    wide = wide.rename_axis(index='车型', columns='日期')
+    return wide.reset_index().melt(id_vars='车型', var_name='日期', value_name=metric).dropna(subset=[metric])
+
+
+def model_monthly(tables, brand, start=None, end=None, forecast=None, metric='销量', metric_wide=None):
+    """1. 单品牌车型销量：车型趋势图和车型月度销量表
+
+    metric_wide 为滑动平均、累计等指标的宽表，给出时图表和表格显示该指标，不显示预测。
+    """
+    # 取出选定品牌的车型月度销量（或指标）
+    if metric_wide is None:
+        brand_data = tables['model_monthly'].loc[[brand]].reset_index()
+        model_monthly = tables['model_monthly_wide'].loc[brand]
+    else:
+        brand_data = metric_long(metric_wide, metric)
+        model_monthly = metric_wide
+
+    # 创建车型销量趋势图，只绘制可见范围，每条曲线按形状降采样
+    fig_models = line_chart(
+        brand_data,
+        x='日期',
+        y=metric,
+        color='车型',
+        mode='lines+markers+text',
+        start=start,
+        end=end,
+        title=f'{brand}各车型{metric}趋势',
+        labels={'日期': '时间', '销量': '月度销量'}
+    )
+
+    # 添加数据标签
+    fig_models.update_traces(textposition='top center')
+
+    # 下个月的预测
+    if metric_wide is None:
+        add_forecast(fig_models, forecast, brand, end)
+
+    # 创建车型月度销量表格，数值保持原类型，由列配置控制显示格式
+    model_monthly = in_range(model_monthly, start, end)
+    table, config = number_table(with_total(model_monthly.round(0)), date_format='%Y-%m')
+    return fig_models, table, config
+
+
+def brand_total(tables, brands):
+    """2. 品牌总销量：堆叠柱状图加同比增长率折线，以及品牌月度销量表"""
+    # 取出所选品牌的月度总销量
+    brand_total = tables['brand_monthly'].loc[brands].reset_index()[['日期', '品牌', '销量']]
+
+    # 计算所选品牌每个月的总销量和去年同期销量
+    monthly_sum = growth_table(brand_total, [], 'M').reset_index()
+
+    # 创建堆叠柱状图
+    fig_brand_total = go.Figure()
+
+    # 添加每个品牌的堆叠柱状图
+    for brand in brands:
+        brand_data = brand_total[brand_total['品牌'] == brand]
+        fig_brand_total.add_trace(
+            go.Bar(
+                name=brand,
+                x=brand_data['日期'],
+                y=brand_data['销量'],
+                showlegend=True
+            )
+        )
+
+    # 添加同比增长率折线图
+    fig_brand_total.add_trace(
+        scatter_trace(
+            len(monthly_sum),
+            name='同比增长率',
+            x=monthly_sum['日期'],
+            y=monthly_sum['同比增长率'],
+            yaxis='y2',
+            line=dict(color='#E53935', width=2.5),  # 加粗红色线条
+            mode='lines+markers',
+            marker=dict(size=8)
+        )
+    )
+
+    # 更新布局
+    fig_brand_total.update_layout(
+        barmode='stack',
+        yaxis=dict(
+            title='销量',
+            side='left',
+            titlefont=dict(size=16),  # 增大轴标题字体
+            tickfont=dict(size=14)    # 增大刻度字体
+        ),
+        yaxis2=dict(
+            title='同比增长率 (%)',
+            side='right',
+            overlaying='y',
+            tickformat='.1f',
+            titlefont=dict(size=16),
+            tickfont=dict(size=14)
+        ),
+        xaxis=dict(
+            title='时间',
+            titlefont=dict(size=16),
+            tickfont=dict(size=14)
+        ),
+        showlegend=True,
+        legend=dict(TOP_LEGEND, font=dict(size=14)),  # 增大图例字体
+        hovermode='x unified',
+        plot_bgcolor='white',  # 设置白色背景
+        paper_bgcolor='white'
+    )
+
+    # 设置y轴从0开始
+    fig_brand_total.update_yaxes(rangemode="tozero")
+
+    # 创建品牌月度销量表格
+    table, config = number_table(with_total(tables['brand_monthly_wide'].loc[sorted(brands)].round(0)), date_format='%Y-%m')
+    return fig_brand_total, table, config
+
+
+def brand_compare(tables, brands, growth_type):
+    """3. 品牌对比：销量对比图、增长率对比图和详细对比数据表"""
+    rate_column = f'{growth_type}增长率'
+
+    # 取出所有选中品牌的月度销量和增长率
+    all_compare_data = tables['brand_monthly'].loc[brands].reset_index()
+
+    # 创建销量对比图
+    fig_compare = go.Figure()
+
+    # 为每个品牌添加柱状图，柱子较多时不显示数据标签
+    show_text = not use_webgl(len(all_compare_data))
+    for i, brand in enumerate(brands):
+        brand_data = all_compare_data[all_compare_data['品牌'] == brand]
+        fig_compare.add_trace(
+            go.Bar(
+                name=brand,
+                x=brand_data['日期'],
+                y=brand_data['销量'],
+                text=brand_data['销量'].round(0) if show_text else None,
+                textposition='auto',
+                offsetgroup=i
+            )
+        )
+
+    # 更新布局
+    fig_compare.update_layout(
+        title='品牌销量对比',
+        barmode='group',
+        yaxis_title='销量',
+        xaxis_title='时间',
+        showlegend=True,
+        legend=TOP_LEGEND,
+        hovermode='x unified'
+    )
+
+    # 创建增长率对比图
+    fig_growth = go.Figure()
+
+    # 添加0%基准线
+    fig_growth.add_hline(
+        y=0,
+        line_dash="dash",
+        line_color="gray",
+        annotation_text="0%",
+        annotation_position="left"
+    )
+
+    # 为每个品牌添加增长率折线
+    for brand in brands:
+        brand_data = all_compare_data[all_compare_data['品牌'] == brand]
+        fig_growth.add_trace(
+            scatter_trace(
+                len(all_compare_data),
+                name=brand,
+                x=brand_data['日期'],
+                y=brand_data[rate_column],
+                mode='lines+markers',
+                line=dict(width=2),
+                marker=dict(size=8)
+            )
+        )
+
+    # 更新布局
+    fig_growth.update_layout(
+        title=f'品牌{growth_type}增长率对比',
+        yaxis_title=f'{rate_column} (%)',
+        xaxis_title='时间',
+        showlegend=True,
+        legend=TOP_LEGEND,
+        hovermode='x unified'
+    )
+
+    # 设置y轴格式
+    fig_growth.update_yaxes(tickformat='.1f')
+
+    # 数据透视表
+    compare_table = all_compare_data.pivot_table(
+        index=['日期'],
+        columns=['品牌'],
+        values=['销量', rate_column],
+        aggfunc={'销量': 'sum', rate_column: 'first'},
+        observed=True
+    ).round(1)
+
+    # 重新排序列以使销量和增长率交替显示
+    new_columns = []
+    for brand in brands:
+        new_columns.extend([('销量', brand), (rate_column, brand)])
+    compare_table = compare_table[new_columns]
+
+    # 展平多级列名，销量和增长率分别按列配置显示格式
+    compare_table.columns = [f'{brand} {metric}' for metric, brand in compare_table.columns]
+    compare_config = {
+        **column_config([f'{brand} 销量' for brand in brands]),
+        **column_config([f'{brand} {rate_column}' for brand in brands], PERCENT_FORMAT),
+    }
+    compare_table = compare_table.sort_index(ascending=False)
+    compare_table.index = compare_table.index.strftime('%Y-%m')
+    return fig_compare, fig_growth, compare_table, compare_config
+
+
+def model_weekly(tables, brand, start=None, end=None, forecast=None, metric='销量', metric_wide=None):
+    """4. 周度数据：车型周度趋势图、车型占比饼图和车型周度销量表
+
+    metric_wide 为滑动平均、累计等指标的宽表，给出时趋势图和表格显示该指标，不显示预测。
+    """
+    # 取出选定品牌的车型周度销量（或指标）
+    if metric_wide is None:
+        model_data = tables['model_weekly'].loc[[brand]].reset_index()
+        model_pivot = tables['model_weekly_wide'].loc[brand]
+    else:
+        model_data = metric_long(metric_wide, metric)
+        model_pivot = metric_wide
+
+    # 创建车型销量趋势图，只绘制可见范围，每条曲线按形状降采样
+    fig_models = line_chart(
+        model_data,
+        x='日期',
+        y=metric,
+        color='车型',
+        start=start,
+        end=end,
+        title=f'{brand}各车型周度{metric}趋势',
+        labels={'日期': '日期', '销量': '周度销量'}
+    )
+
+    # 未来4周的预测
+    if metric_wide is None:
+        add_forecast(fig_models, forecast, brand, end)
+
+    # 调整布局
+    fig_models.update_layout(
+        xaxis_title='日期',
+        yaxis_title=metric,
+        hovermode='x unified',
+        legend=TOP_LEGEND
+    )
+
+    # 取出车型占比
+    model_shares = tables['model_weekly_share'].loc[[brand]].set_index('车型')['占比']
+
+    # 创建占比饼图
+    fig_shares = px.pie(
+        values=model_shares.values,
+        names=model_shares.index,
+        title=f'{brand}车型销量占比分析'
+    )
+
+    # 更新布局
+    fig_shares.update_traces(textposition='inside', textinfo='percent+label')
+    fig_shares.update_layout(showlegend=False)
+
+    # 取出车型周度销量表格
+    model_pivot = in_range(model_pivot, start, end)
+    table, config = number_table(with_total(model_pivot.round(0)))
+    return fig_models, fig_shares, table, config
+
+
+def price_segments(tables, low=None, high=None):
+    """5. 价格区间：各价格区间周度销量、所选价格范围内的品牌销量和车型明细"""
+    # 各价格区间的周度销量
+    fig_bands = px.area(
+        tables['price_band_weekly'],
+        x='日期',
+        y='销量',
+        color='价格区间',
+        title='各价格区间周度销量',
+        labels={'日期': '日期', '销量': '周度销量'}
+    )
+    fig_bands.update_layout(hovermode='x unified', legend=TOP_LEGEND)
+
+    # 中间价在所选范围内的车型，按价格索引直接取出
+    models = tables['price_index'].between(low, high)
+    brand_sales = models.groupby('品牌', observed=True)['销量'].sum().sort_values(ascending=False)
+    fig_brands = px.bar(
+        x=brand_sales.index.astype(str),
+        y=brand_sales.values,
+        title='所选价格范围内各品牌销量',
+        labels={'x': '品牌', 'y': '销量'}
+    )
+
+    table = models[['品牌', '车型', '售价', '中间价', '价格区间', '销量']].sort_values('销量', ascending=False)
+    table = table.set_index(['品牌', '车型'])
+    config = {**column_config(['销量']), **column_config(['中间价'], '%.2f万')}
+    return fig_bands, fig_brands, table, config
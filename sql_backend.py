@@ -0,0 +1,261 @@
+import os
+import sqlite3
+import uuid
+
+import pandas as pd
+
+import cube
+import data_store
+from growth import growth_table
+from price_index import PriceIndex, add_price_columns, parse_prices, price_band
+
+# 设置环境变量 SALES_BACKEND=sqlite 后，采集脚本同时写入数据库，页面按需从数据库查询
+DB_PATH = os.getenv('SALES_DB_PATH', os.path.join(data_store.DATA_DIR, 'sales.sqlite'))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sales (
+    source TEXT NOT NULL,
+    brand TEXT NOT NULL,
+    model TEXT NOT NULL,
+    price TEXT NOT NULL,
+    period TEXT NOT NULL,
+    sales INTEGER NOT NULL,
+    PRIMARY KEY (source, brand, model, price, period)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_sales_brand_period ON sales (source, brand, period);
+CREATE INDEX IF NOT EXISTS idx_sales_model_period ON sales (source, model, period);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+UPSERT = """
+INSERT INTO sales (source, brand, model, price, period, sales) VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT (source, brand, model, price, period) DO UPDATE SET sales = excluded.sales
+"""
+# 销量为空（没有获取到）的行只在数据库中还没有该行时按0写入
+INSERT_MISSING = """
+INSERT INTO sales (source, brand, model, price, period, sales) VALUES (?, ?, ?, ?, ?, 0)
+ON CONFLICT (source, brand, model, price, period) DO NOTHING
+"""
+
+
+def enabled():
+    return os.getenv('SALES_BACKEND', '').lower() == 'sqlite'
+
+
+def connect(path=None):
+    """打开数据库并确保表和索引存在"""
+    path = path or DB_PATH
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    conn = sqlite3.connect(path, check_same_thread=False)
+    # WAL模式下写入时页面仍可读取
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def has_source(conn, source):
+    return conn.execute('SELECT 1 FROM sales WHERE source = ? LIMIT 1', (source,)).fetchone() is not None
+
+
+def write_long(conn, long, source, replace=False):
+    """在一个事务中写入长表，同一 (brand, model, price, period) 以新数据为准，并更新数据版本
+
+    replace 为真时先删除该数据源的全部数据。销量为空的行不覆盖已有数据。
+    """
+    missing = long['sales'].isna()
+
+    def rows(frame, with_sales=True):
+        columns = [
+            [source] * len(frame),
+            frame['brand'].astype(str),
+            frame['model'].astype(str),
+            frame['price'].astype(object).fillna('').astype(str),
+            frame['period'].dt.strftime('%Y-%m-%d'),
+        ]
+        if with_sales:
+            columns.append(frame['sales'].round().astype(int).tolist())
+        return zip(*columns)
+
+    with conn:
+        if replace:
+            conn.execute('DELETE FROM sales WHERE source = ?', (source,))
+        conn.executemany(UPSERT, rows(long[~missing]))
+        conn.executemany(INSERT_MISSING, rows(long[missing], with_sales=False))
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('version', ?)", (uuid.uuid4().hex[:16],))
+
+
+def build_from_csv(conn, sources=None):
+    """从现有的宽表CSV初始化数据库"""
+    for source in sources or data_store.SOURCES:
+        csv_name = data_store.SOURCES[source]['csv']
+        csv_path = os.path.join(data_store.ROOT_DIR, csv_name)
+        if os.path.exists(csv_path):
+            write_long(conn, data_store.wide_to_long(pd.read_csv(csv_path, encoding='utf-8-sig'), source), source)
+            print(f"已将 {csv_name} 写入数据库 {source}")
+
+
+def write_wide(wide, source, path=None):
+    """采集脚本使用：将宽表写入数据库，数据库中还没有该数据源时先用已有CSV初始化，宽表中的空值不覆盖已有销量"""
+    conn = connect(path)
+    try:
+        if not has_source(conn, source):
+            build_from_csv(conn, [source])
+        write_long(conn, data_store.wide_to_long(wide, source, fill=False), source)
+    finally:
+        conn.close()
+
+
+def replace_wide(wide, source, path=None):
+    """用宽表替换数据库中一个数据源的全部数据"""
+    conn = connect(path)
+    try:
+        write_long(conn, data_store.wide_to_long(wide, source), source, replace=True)
+    finally:
+        conn.close()
+
+
+def data_version(conn):
+    """数据版本在每次写入的事务中更新"""
+    row = conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+    return row[0] if row else None
+
+
+def _where(source, brands=None, start=None, end=None):
+    """生成品牌和时间条件，使用 (source, brand, period) 索引"""
+    clauses = ['source = ?']
+    params = [source]
+    if brands is not None:
+        brands = list(brands)
+        if brands:
+            clauses.append(f"brand IN ({', '.join('?' * len(brands))})")
+            params.extend(brands)
+        else:
+            clauses.append('0')
+    if start is not None:
+        clauses.append('period >= ?')
+        params.append(pd.Timestamp(start).strftime('%Y-%m-%d'))
+    if end is not None:
+        clauses.append('period <= ?')
+        params.append(pd.Timestamp(end).strftime('%Y-%m-%d'))
+    return ' AND '.join(clauses), params
+
+
+def _query(conn, sql, params, columns):
+    """执行查询并转换为页面使用的列名和类型"""
+    frame = pd.read_sql_query(sql, conn, params=params)
+    frame.columns = columns
+    if '日期' in frame.columns:
+        frame['日期'] = pd.to_datetime(frame['日期'])
+    for column in ('品牌', '车型'):
+        if column in frame.columns:
+            frame[column] = frame[column].astype('category')
+    if '销量' in frame.columns:
+        frame['销量'] = frame['销量'].astype('int64')
+    return frame
+
+
+def brands(conn, source='dongchedi'):
+    return [row[0] for row in conn.execute('SELECT DISTINCT brand FROM sales WHERE source = ? ORDER BY brand', (source,))]
+
+
+def periods(conn, source='dongchedi'):
+    rows = conn.execute('SELECT DISTINCT period FROM sales WHERE source = ? ORDER BY period', (source,))
+    return pd.DatetimeIndex([row[0] for row in rows])
+
+
+def brand_tables(conn, brands):
+    """品牌月度总销量及增长率，在数据库中按 (品牌, 月份) 汇总，只取出所选品牌"""
+    where, params = _where('dongchedi', brands)
+    frame = _query(
+        conn,
+        f'SELECT brand, period, SUM(sales) FROM sales WHERE {where} GROUP BY brand, period',
+        params,
+        ['品牌', '日期', '销量']
+    )
+    brand_monthly = growth_table(frame, ['品牌'], 'M').reset_index()
+    # 与预计算结果一致，宽表包含所有月份列，没有选择品牌时也能生成空表格
+    wide = cube.to_wide(brand_monthly, ['品牌']).reindex(columns=periods(conn, 'dongchedi'))
+    return {
+        'brand_monthly': brand_monthly.set_index('品牌'),
+        'brand_monthly_wide': wide.rename_axis(columns='日期'),
+    }
+
+
+def price_tables(conn):
+    """价格区间部分使用的表：各 (品牌, 车型, 售价) 的周度总销量和价格索引、各价格区间的周度销量
+
+    汇总在数据库中完成，售价只按不重复的文本解析。
+    """
+    where, params = _where('autohome')
+    model_prices = _query(
+        conn,
+        f'SELECT brand, model, price, SUM(sales) FROM sales WHERE {where} GROUP BY brand, model, price',
+        params,
+        ['品牌', '车型', '售价', '销量']
+    )
+    model_prices['售价'] = model_prices['售价'].astype('category')
+    model_prices = add_price_columns(model_prices)
+
+    weekly = _query(
+        conn,
+        f'SELECT price, period, SUM(sales) FROM sales WHERE {where} GROUP BY price, period',
+        params,
+        ['售价', '日期', '销量']
+    )
+    bands = price_band(parse_prices(weekly['售价'].astype('category'))['中间价']).rename('价格区间')
+    price_band_weekly = weekly.groupby([bands, '日期'], observed=True)['销量'].sum().reset_index()
+    return {
+        'model_prices': model_prices,
+        'price_band_weekly': price_band_weekly,
+        'price_index': PriceIndex(model_prices),
+    }
+
+
+def model_wide(conn, source):
+    """所有车型的 车型×周期 宽表（同一车型不同售价合并），用于批量预测"""
+    where, params = _where(source)
+    frame = _query(
+        conn,
+        f'SELECT brand, model, period, SUM(sales) FROM sales WHERE {where} GROUP BY brand, model, period',
+        params,
+        ['品牌', '车型', '日期', '销量']
+    )
+    return cube.to_wide(frame, ['品牌', '车型'])
+
+
+def model_tables(conn, source, brand, start=None, end=None):
+    """一个品牌的车型销量（同一车型不同售价合并），在数据库中按 (车型, 周期) 汇总，只取出可见时间范围"""
+    name = 'model_monthly' if source == 'dongchedi' else 'model_weekly'
+    where, params = _where(source, [brand], start, end)
+    frame = _query(
+        conn,
+        f'SELECT brand, model, period, SUM(sales) FROM sales WHERE {where} GROUP BY brand, model, period',
+        params,
+        ['品牌', '车型', '日期', '销量']
+    )
+    tables = {
+        name: frame.set_index('品牌'),
+        f'{name}_wide': cube.to_wide(frame, ['品牌', '车型']),
+    }
+    if source == 'autohome':
+        # 占比按全部周度数据计算，与页面其他后端一致
+        where, params = _where(source, [brand])
+        shares = _query(
+            conn,
+            f'SELECT brand, model, SUM(sales) FROM sales WHERE {where} GROUP BY brand, model',
+            params,
+            ['品牌', '车型', '销量']
+        )
+        shares['占比'] = (shares['销量'] / shares['销量'].sum() * 100).round(1)
+        tables['model_weekly_share'] = shares.set_index('品牌')
+    return tables
+
+
+if __name__ == '__main__':
+    connection = connect()
+    build_from_csv(connection)
+    print(f"数据库已初始化: {DB_PATH}，数据版本 {data_version(connection)}")
@@ -0,0 +1,23 @@
+import pandas as pd
+import streamlit as st
+
+# 表格中使用的数字格式，由前端按列渲染，数据保持数值类型
+# 销量按浏览器区域设置显示千位分隔符（如 123,456），需要 Streamlit 1.43 及以上；百分比等使用printf风格
+NUMBER_FORMAT = "localized"
+PERCENT_FORMAT = "%.1f%%"
+
+
+def column_config(columns, fmt=NUMBER_FORMAT):
+    """为给定的列生成统一数字格式的列配置"""
+    return {column: st.column_config.NumberColumn(column, format=fmt) for column in columns}
+
+
+def number_table(frame, fmt=NUMBER_FORMAT, date_format='%Y-%m-%d'):
+    """返回用于显示的表格和列配置
+
+    日期列名转换为字符串以便按列配置格式，数值本身不做逐单元格的字符串转换。
+    """
+    table = frame.copy(deep=False)
+    if isinstance(table.columns, pd.DatetimeIndex):
+        table.columns = table.columns.strftime(date_format)
+    return table, column_config(table.columns, fmt)
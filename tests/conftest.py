@@ -0,0 +1,26 @@
+import importlib.util
+import os
+import sys
+
+import pytest
+
+SCRIPT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts')
+sys.path.insert(0, SCRIPT_DIR)
+
+from mock_server import start_server  # noqa: E402
+
+
+def load_collector():
+    spec = importlib.util.spec_from_file_location(
+        'autohome_collector', os.path.join(SCRIPT_DIR, '汽车销售数据采集_汽车之家.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def server():
+    server = start_server(latency=0.0, series_per_brand=5)
+    yield server
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,56 @@
+import glob
+import os
+
+import pytest
+
+from checkpoint import CheckpointStore, write_csv_atomic
+from conftest import load_collector
+from mock_server import AUTOHOME_PATH
+
+
+class Interrupted(BaseException):
+    """模拟保存CSV之前采集被中断（如CI超时）"""
+
+
+def interrupt(*args, **kwargs):
+    raise Interrupted()
+
+
+def test_failed_units_are_not_checkpointed_and_resume_refetches(server, tmp_path, monkeypatch):
+    collector = load_collector()
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(collector, 'url', server.base_url + AUTOHOME_PATH)
+    # 只验证检查点，不写入项目的长格式存储
+    monkeypatch.setattr(collector.data_store, 'write_wide', lambda *args: None)
+    monkeypatch.setattr(collector.sql_backend, 'enabled', lambda: False)
+    store = CheckpointStore('autohome', directory=str(tmp_path / 'checkpoints'))
+    units = len(collector.brandid) * len(collector.generate_week_dates())
+
+    def run(resume):
+        collector.main(rate=0, concurrency=8, full=True, retries=0, checkpoints=store, resume=resume)
+
+    def saved():
+        return len(glob.glob(os.path.join(store.directory, '*.json')))
+
+    # 所有请求都失败后中断：失败的(品牌, 周度)不能写入检查点
+    server.error_rate = 1.0
+    monkeypatch.setattr(collector, 'write_csv_atomic', interrupt)
+    with pytest.raises(Interrupted):
+        run(resume=False)
+    assert server.stats['errors'] == units
+    assert saved() == 0
+
+    # 服务恢复后继续采集再次中断：之前失败的单元全部重新请求，完成后写入检查点
+    server.error_rate = 0.0
+    with pytest.raises(Interrupted):
+        run(resume=True)
+    assert server.stats['ok'] == units
+    assert saved() == units
+
+    # 再次继续时全部从检查点读取，不再发出请求，保存成功后清空检查点
+    monkeypatch.setattr(collector, 'write_csv_atomic', write_csv_atomic)
+    requests_before = server.stats['requests']
+    run(resume=True)
+    assert server.stats['requests'] == requests_before
+    assert saved() == 0
+    assert os.path.exists(tmp_path / '汽车销量数据_autohome_周度.csv')
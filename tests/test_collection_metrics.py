@@ -0,0 +1,32 @@
+import csv
+import glob
+import os
+
+from collection_metrics import write_report
+
+
+def read_rows(path):
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        return list(csv.DictReader(f))
+
+
+def test_runs_csv_keeps_columns_aligned(tmp_path):
+    directory = str(tmp_path)
+    write_report('orchestrator', {'success': True, 'autohome_seconds': 1.5, 'autohome_quality': 'passed',
+                                  'dongchedi_seconds': 2.0}, directory)
+    # 缺少字段的行按已有表头写入，缺少的列留空
+    write_report('orchestrator', {'success': False, 'dongchedi_seconds': 3.0}, directory)
+
+    rows = read_rows(os.path.join(directory, 'orchestrator_runs.csv'))
+    assert rows[1] == {'success': 'False', 'autohome_seconds': '', 'autohome_quality': '', 'dongchedi_seconds': '3.0'}
+
+
+def test_runs_csv_rotates_when_new_fields_appear(tmp_path):
+    directory = str(tmp_path)
+    write_report('orchestrator', {'success': True}, directory)
+    write_report('orchestrator', {'success': True, 'dongchedi_quality': 'passed'}, directory)
+
+    rotated = glob.glob(os.path.join(directory, 'orchestrator_runs_*.csv'))
+    assert len(rotated) == 1
+    assert read_rows(rotated[0]) == [{'success': 'True'}]
+    assert read_rows(os.path.join(directory, 'orchestrator_runs.csv')) == [{'success': 'True', 'dongchedi_quality': 'passed'}]
@@ -0,0 +1,79 @@
+import os
+import sqlite3
+
+import pandas as pd
+
+from conftest import load_collector
+from mock_server import AUTOHOME_PATH
+
+
+def test_failed_refetch_keeps_existing_sales(server, tmp_path, monkeypatch):
+    collector = load_collector()
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(collector, 'url', server.base_url + AUTOHOME_PATH)
+    monkeypatch.setattr(collector, 'brandid', {'品牌A': '1', '品牌B': '2'})
+    # 只读取临时目录中的CSV，不使用项目根目录的数据
+    monkeypatch.setattr(collector, 'find_existing_csv', lambda name: name if os.path.exists(name) else None)
+    # 长格式存储和数据库都写入临时目录
+    monkeypatch.setattr(collector.data_store, 'ROOT_DIR', str(tmp_path))
+    monkeypatch.setattr(collector.data_store, 'STORE_DIR', str(tmp_path / 'sales'))
+    monkeypatch.setattr(collector.sql_backend, 'DB_PATH', str(tmp_path / 'sales.sqlite'))
+    monkeypatch.setattr(collector.sql_backend, 'enabled', lambda: True)
+    csv_name = '汽车销量数据_autohome_周度.csv'
+
+    collector.main(rate=0, concurrency=4, full=True, retries=0)
+    before = pd.read_csv(csv_name, encoding='utf-8-sig').set_index('车型')
+    week = before.columns[-1]
+    stored = collector.data_store.read_store('autohome', brands=['品牌A'])
+    assert (stored['sales'] > 0).any()
+
+    # 重新获取最近两周时品牌A最后一周的请求失败，品牌A的前一周和品牌B正常
+    get_sales_data = collector.get_sales_data
+
+    def fail_brand_a(brand_id, date, *args, **kwargs):
+        return None if (brand_id, date) == ('1', week) else get_sales_data(brand_id, date, *args, **kwargs)
+
+    monkeypatch.setattr(collector, 'get_sales_data', fail_brand_a)
+    collector.main(rate=0, concurrency=4, refetch=2, retries=0)
+
+    # CSV、长格式存储和数据库中品牌A的销量都保持不变，没有被0覆盖
+    after = pd.read_csv(csv_name, encoding='utf-8-sig').set_index('车型')
+    brand_a = before['汽车品牌'] == '品牌A'
+    pd.testing.assert_series_equal(after.loc[brand_a, week], before.loc[brand_a, week])
+    pd.testing.assert_frame_equal(collector.data_store.read_store('autohome', brands=['品牌A']), stored)
+    with sqlite3.connect(tmp_path / 'sales.sqlite') as conn:
+        rows = dict(conn.execute(
+            "SELECT model, sales FROM sales WHERE brand = '品牌A' AND period = ?",
+            (pd.Timestamp(week).strftime('%Y-%m-%d'),)
+        ).fetchall())
+    assert rows == before.loc[brand_a, week].astype(int).to_dict()
+
+
+def test_partially_fetched_unit_is_not_saved(server, tmp_path, monkeypatch):
+    collector = load_collector()
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(collector, 'url', server.base_url + AUTOHOME_PATH)
+    monkeypatch.setattr(collector, 'brandid', {'品牌A': '1', '品牌B': '2'})
+    # 只读取临时目录中的CSV，不使用项目根目录的数据
+    monkeypatch.setattr(collector, 'find_existing_csv', lambda name: name if os.path.exists(name) else None)
+    monkeypatch.setattr(collector.data_store, 'write_wide', lambda *args: None)
+    monkeypatch.setattr(collector.sql_backend, 'enabled', lambda: False)
+    # 每个(品牌, 周度)两页，品牌A最后一周的第2页失败
+    server.series_per_brand = collector.PAGE_SIZE + 10
+    week = collector.generate_week_dates()[-1]
+    get_sales_data = collector.get_sales_data
+
+    def fail_second_page(brand_id, date, pageindex=1, **kwargs):
+        if (brand_id, date, pageindex) == ('1', week, 2):
+            return None
+        return get_sales_data(brand_id, date, pageindex, **kwargs)
+
+    monkeypatch.setattr(collector, 'get_sales_data', fail_second_page)
+    collector.main(rate=0, concurrency=4, full=True, retries=0)
+
+    result = pd.read_csv('汽车销量数据_autohome_周度.csv', encoding='utf-8-sig')
+    brand_a = result['汽车品牌'] == '品牌A'
+    assert brand_a.sum() == server.series_per_brand
+    # 第1页的数据也不保存，该周期整体为空
+    assert result.loc[brand_a, week].isna().all()
+    assert result.loc[~brand_a, week].notna().all()
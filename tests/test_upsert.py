@@ -0,0 +1,39 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts'))
+
+from upsert import upsert_wide  # noqa: E402
+
+
+def wide(rows, periods):
+    return pd.DataFrame(rows, columns=['汽车品牌', '车型', '售价'] + periods)
+
+
+def test_duplicate_keys_are_merged_not_dropped(capsys):
+    old = wide([['A', 'x', '10万', 1, np.nan], ['A', 'x', '10万', np.nan, 2], ['B', 'y', '20万', 3, 4]],
+               ['202501', '202502'])
+    new = wide([['A', 'x', '10万', 5, np.nan], ['A', 'x', '10万', np.nan, 6], ['C', 'z', '30万', 7, 8]],
+               ['202502', '202503'])
+
+    result = upsert_wide(old, new).set_index('车型')
+
+    assert list(result.index) == ['x', 'y', 'z']
+    assert list(result.columns[2:]) == ['202501', '202502', '202503']
+    assert result.loc['x', ['202501', '202502', '202503']].tolist() == [1, 5, 6]
+    assert result.loc['y', ['202501', '202502']].tolist() == [3, 4]
+    output = capsys.readouterr().out
+    assert '新数据中有 1 行' in output
+    assert '已有数据中有 1 行' in output
+
+
+def test_duplicate_keys_without_old_data():
+    new = wide([['A', 'x', '10万', 5], ['A', 'x', '10万', 6]], ['202501'])
+
+    result = upsert_wide(None, new)
+
+    assert len(result) == 1
+    assert result['202501'].tolist() == [6]